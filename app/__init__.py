@@ -53,9 +53,27 @@ def create_app(config_class=Config):
     from . import routes, models
     app.register_blueprint(routes.bp)
 
+    # 4. Monta os caches em memória usados pelo quiosque
+    from .analises import cache_analises
+    from .elegibilidade import indice_elegibilidade
+    from .eventos import canal_eventos
+    from .frequencias import gravador_frequencia
+    from .ocupacao import contador_ocupacao
+    from .painel import cache_painel
+    from .qrcodes import cache_qrcode
+    from .tentativas import tentativas_pin
+    indice_elegibilidade.init_app(app)
+    canal_eventos.init_app(app)
+    gravador_frequencia.init_app(app)
+    contador_ocupacao.init_app(app)
+    cache_painel.init_app(app)
+    tentativas_pin.init_app(app)
+    cache_qrcode.init_app(app)
+    cache_analises.init_app(app)
+
     return app
 
-# 4. Importa os modelos aqui para evitar importação circular
+# 5. Importa os modelos aqui para evitar importação circular
 from .models import User
 
 # Esta função é usada pelo Flask-Login para carregar um usuário
@@ -0,0 +1,174 @@
+# fitpro_academia/app/analises.py
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from . import db
+from .arquivamento import fonte_frequencia
+from .models import Matricula, Plano
+from .resumos import dia_local, intervalo_utc
+
+DIAS_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+
+# Check-ins trazidos do banco por vez (cursor no servidor)
+LINHAS_POR_LOTE = 50000
+
+# Multiplicador que junta (membro_id, dia) num único inteiro: dia * CHAVE_DIA + membro_id
+CHAVE_DIA = 1 << 32
+
+
+def _dia_numero(dia):
+    """Dias desde 01/01/1970 (o mesmo número que datetime64[D] usa)."""
+    return int(np.datetime64(dia, 'D').astype(np.int64))
+
+
+def _dia_semana(dias):
+    """Dia da semana (0 = segunda) de um array de dias desde 01/01/1970, que foi uma quinta."""
+    return (dias + 3) % 7
+
+
+def _lotes_visitas(inicio_utc, fim_utc):
+    """
+    Entradas liberadas do período em lotes de colunas: (membro_id, horário
+    local) como arrays do NumPy, sem montar um objeto por check-in.
+    """
+    frequencia = fonte_frequencia(inicio_utc)
+    consulta = select(frequencia.data_hora, frequencia.membro_id).where(
+        frequencia.tipo == 'Entrada', frequencia.status == 'Liberado',
+        frequencia.data_hora.between(inicio_utc, fim_utc)
+    )
+    for lote in db.session.execute(consulta.execution_options(yield_per=LINHAS_POR_LOTE)).partitions():
+        datas, membros = zip(*lote)
+        locais = np.array(datas, dtype='datetime64[s]') - np.timedelta64(3, 'h')
+        yield np.array(membros, dtype=np.int64), locais
+
+
+def _taxas_por_plano(presencas, inicio, fim):
+    """
+    Frequência por plano a partir das presenças (array de dia * CHAVE_DIA +
+    membro_id, sem repetição). Cada presença conta para a matrícula não
+    cancelada que cobria aquele dia.
+    """
+    inicio_dia, fim_dia = _dia_numero(inicio), _dia_numero(fim)
+    matriculas = pd.DataFrame(db.session.execute(
+        select(Matricula.membro_id, Matricula.plano_id, Plano.nome, Matricula.data_inicio, Matricula.data_fim)
+        .join(Plano, Plano.id == Matricula.plano_id)
+        .where(Matricula.status != 'Cancelada', Matricula.data_inicio <= fim, Matricula.data_fim >= inicio)
+    ).all(), columns=['membro_id', 'plano_id', 'plano', 'data_inicio', 'data_fim'])
+    if matriculas.empty:
+        return []
+
+    matriculas['inicio'] = pd.to_datetime(matriculas['data_inicio']).values.astype('datetime64[D]').astype(np.int64)
+    matriculas['fim'] = pd.to_datetime(matriculas['data_fim']).values.astype('datetime64[D]').astype(np.int64)
+    # Dias de cada matrícula dentro do período: a base da taxa de visitas por semana
+    matriculas['dias_no_periodo'] = (
+        matriculas['fim'].clip(upper=fim_dia) - matriculas['inicio'].clip(lower=inicio_dia) + 1
+    ).clip(lower=0)
+
+    visitas = pd.DataFrame({'membro_id': presencas % CHAVE_DIA, 'dia': presencas // CHAVE_DIA})
+    visitas = visitas.merge(matriculas[['membro_id', 'plano_id', 'inicio', 'fim']], on='membro_id')
+    visitas = visitas[(visitas['dia'] >= visitas['inicio']) & (visitas['dia'] <= visitas['fim'])]
+    # Numa renovação antecipada duas matrículas cobrem o mesmo dia: conta uma vez só
+    visitas = visitas.drop_duplicates(['membro_id', 'dia'])
+
+    por_plano = matriculas.groupby(['plano_id', 'plano']).agg(
+        alunos=('membro_id', 'nunique'), dias_matriculados=('dias_no_periodo', 'sum')
+    ).join(visitas.groupby('plano_id').agg(
+        alunos_presentes=('membro_id', 'nunique'), presencas=('dia', 'size')
+    ), on='plano_id').fillna(0).reset_index().sort_values('plano')
+
+    return [
+        {
+            'plano': linha.plano,
+            'alunos': int(linha.alunos),
+            'alunos_presentes': int(linha.alunos_presentes),
+            'presencas': int(linha.presencas),
+            'taxa_presenca': round(100 * linha.alunos_presentes / linha.alunos, 1) if linha.alunos else 0.0,
+            'visitas_por_semana': round(7 * linha.presencas / linha.dias_matriculados, 2) if linha.dias_matriculados else 0.0,
+        }
+        for linha in por_plano.itertuples()
+    ]
+
+
+def calcular(inicio, fim):
+    """
+    Mapa de calor (dia da semana x hora local) das entradas liberadas entre
+    os dias locais 'inicio' e 'fim', com o total e a média por dia, e a
+    frequência por plano. Dias futuros do período ficam de fora.
+    """
+    fim = min(fim, dia_local(datetime.utcnow()))
+    total = np.zeros(7 * 24, dtype=np.int64)
+    pares = []
+    if fim >= inicio:
+        for membros, locais in _lotes_visitas(*intervalo_utc(inicio, fim)):
+            dias = locais.astype('datetime64[D]')
+            horas = (locais - dias).astype('timedelta64[h]').astype(np.int64)
+            dias = dias.astype(np.int64)
+            total += np.bincount(_dia_semana(dias) * 24 + horas, minlength=7 * 24)
+            pares.append(np.unique(dias * CHAVE_DIA + membros))
+
+    total = total.reshape(7, 24)
+    # Quantas segundas, terças... o período tem, para a média por dia
+    ocorrencias = np.bincount(_dia_semana(np.arange(_dia_numero(inicio), _dia_numero(fim) + 1)), minlength=7)
+    media = np.divide(total, ocorrencias[:, None], out=np.zeros(total.shape), where=ocorrencias[:, None] > 0)
+    presencas = np.unique(np.concatenate(pares)) if pares else np.empty(0, dtype=np.int64)
+
+    return {
+        'inicio': inicio.isoformat(),
+        'fim': fim.isoformat(),
+        'dias_semana': DIAS_SEMANA,
+        'total': total.tolist(),
+        'media': np.round(media, 2).tolist(),
+        'maximo': float(media.max()),
+        'entradas': int(total.sum()),
+        'planos': _taxas_por_plano(presencas, inicio, fim) if fim >= inicio else [],
+    }
+
+
+class CacheAnalises:
+    """
+    Guarda os resultados de calcular() por período, com a chave incluindo o
+    dia local: na virada do dia tudo é recalculado. Períodos que incluem
+    hoje ainda recebem check-ins e expiram após ANALISES_CACHE_TTL segundos.
+    O cache é por processo e guarda no máximo ANALISES_CACHE_ITENS períodos.
+    """
+
+    def __init__(self):
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+        self.ttl = 300
+        self.max_itens = 32
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ANALISES_CACHE_TTL', 300)
+        self.max_itens = app.config.get('ANALISES_CACHE_ITENS', 32)
+
+    def obter(self, inicio, fim):
+        hoje_local = dia_local(datetime.utcnow())
+        chave = (hoje_local, inicio, fim)
+        with self._lock:
+            guardado = self._resultados.get(chave)
+            if guardado is not None and (fim < hoje_local or time.monotonic() < guardado[0]):
+                self._resultados.move_to_end(chave)
+                return guardado[1]
+
+        resultado = calcular(inicio, fim)
+
+        with self._lock:
+            self._resultados[chave] = (time.monotonic() + self.ttl, resultado)
+            self._resultados.move_to_end(chave)
+            # Chaves de dias anteriores nunca mais serão usadas
+            for antiga in [antiga for antiga in self._resultados if antiga[0] != hoje_local]:
+                del self._resultados[antiga]
+            while len(self._resultados) > self.max_itens:
+                self._resultados.popitem(last=False)
+        return resultado
+
+
+cache_analises = CacheAnalises()
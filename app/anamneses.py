@@ -0,0 +1,71 @@
+# fitpro_academia/app/anamneses.py
+
+import secrets
+from datetime import datetime, timedelta
+
+from flask import current_app, url_for
+from sqlalchemy import delete, exists, insert
+
+from . import db, emails
+from .models import Anamnese, Membro
+
+# Quantos convites são gravados (tokens + fila de e-mails) por commit
+LOTE_CONVITES = 1000
+
+ASSUNTO_CONVITE = 'Complete seu Cadastro - Formulário de Anamnese GymFlow'
+
+
+def validade():
+    return timedelta(days=current_app.config.get('ANAMNESE_VALIDADE_DIAS', 30))
+
+
+def expirada(anamnese, agora=None):
+    """True se o convite não foi respondido e o link já passou da validade."""
+    agora = agora or datetime.utcnow()
+    return anamnese.data_preenchimento is None and anamnese.data_envio < agora - validade()
+
+
+def limpar_expiradas():
+    """Apaga, com um único DELETE, os convites não respondidos que já expiraram. Retorna quantos."""
+    apagadas = db.session.execute(
+        delete(Anamnese).where(
+            Anamnese.data_preenchimento.is_(None), Anamnese.data_envio < datetime.utcnow() - validade()
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return apagadas
+
+
+def convidar_todos(progresso=None):
+    """
+    Cria um convite de anamnese para cada aluno ativo com e-mail que não tem
+    um convite ainda válido aguardando resposta, e coloca os e-mails na fila.
+    Os tokens são gerados de uma vez e gravados com INSERTs em lote, um commit
+    por LOTE_CONVITES. Precisa de um contexto de requisição para montar os
+    links. 'progresso(feitos, total)' é chamada após cada lote.
+    Retorna quantos convites foram criados.
+    """
+    agora = datetime.utcnow()
+    convite_pendente = exists().where(
+        Anamnese.membro_id == Membro.id,
+        Anamnese.data_preenchimento.is_(None),
+        Anamnese.data_envio >= agora - validade()
+    )
+    alunos = db.session.query(Membro.id, Membro.nome, Membro.email).filter(
+        Membro.status == 'Ativo', Membro.email.isnot(None), ~convite_pendente
+    ).order_by(Membro.id).all()
+
+    modelo = current_app.jinja_env.get_template('email/anamnese_invite.html')
+    for inicio in range(0, len(alunos), LOTE_CONVITES):
+        lote = alunos[inicio:inicio + LOTE_CONVITES]
+        tokens = [secrets.token_hex(16) for _ in lote]
+        db.session.execute(insert(Anamnese), [
+            {'membro_id': aluno.id, 'token': token, 'data_envio': agora} for aluno, token in zip(lote, tokens)
+        ])
+        for aluno, token in zip(lote, tokens):
+            link_formulario = url_for('main.preencher_anamnese', token=token, _external=True)
+            emails.enfileirar(aluno.email, ASSUNTO_CONVITE, html=modelo.render(aluno=aluno, link_formulario=link_formulario))
+        db.session.commit()
+        if progresso:
+            progresso(inicio + len(lote), len(alunos))
+    return len(alunos)
@@ -0,0 +1,95 @@
+# fitpro_academia/app/arquivamento.py
+
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, text, union_all
+from sqlalchemy.orm import aliased
+
+from . import db
+from .models import Frequencia, frequencia_arquivo
+
+# Check-ins movidos por transação
+LOTE_ARQUIVAMENTO = 5000
+
+COLUNAS = ('id', 'data_hora', 'tipo', 'status', 'membro_id')
+
+
+def corte_padrao():
+    """Início (em UTC) do dia local mais antigo que fica na tabela frequencia."""
+    dias = current_app.config.get('FREQUENCIA_RETENCAO_DIAS', 180)
+    hoje_local = datetime.utcnow() - timedelta(hours=3)
+    inicio_dia_local = hoje_local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return inicio_dia_local + timedelta(hours=3) - timedelta(days=dias)
+
+
+def _criar_particoes(inicio, fim):
+    """PostgreSQL: cria as partições mensais de frequencia_arquivo entre as datas, se faltarem."""
+    mes = date(inicio.year, inicio.month, 1)
+    while mes <= fim.date():
+        proximo = (mes + timedelta(days=32)).replace(day=1)
+        db.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS frequencia_arquivo_{mes:%Y_%m} PARTITION OF frequencia_arquivo "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO ('{proximo.isoformat()}')"
+        ))
+        mes = proximo
+
+
+def contar_arquivaveis(corte):
+    return db.session.query(func.count(Frequencia.id)).filter(Frequencia.data_hora < corte).scalar()
+
+
+def arquivar(corte=None, lote=LOTE_ARQUIVAMENTO, progresso=None):
+    """
+    Move os check-ins anteriores a 'corte' (UTC) para frequencia_arquivo, em
+    transações de até 'lote' registros: copia com INSERT ... SELECT e apaga da
+    tabela frequencia pelos mesmos ids. 'progresso(movidos)' é chamada após
+    cada lote. Retorna o total movido.
+    """
+    corte = corte or corte_padrao()
+    particionado = db.engine.dialect.name == 'postgresql'
+    origem = [Frequencia.__table__.c[coluna] for coluna in COLUNAS]
+    total = 0
+    while True:
+        # Os ids do lote são lidos antes: uma leitura sincronizada no meio do
+        # caminho nunca é apagada sem ter sido copiada
+        linhas = db.session.execute(
+            select(Frequencia.id, Frequencia.data_hora).where(Frequencia.data_hora < corte)
+            .order_by(Frequencia.id).limit(lote)
+        ).all()
+        if not linhas:
+            return total
+        ids = [frequencia_id for frequencia_id, _ in linhas]
+        if particionado:
+            _criar_particoes(min(data for _, data in linhas), max(data for _, data in linhas))
+        db.session.execute(insert(frequencia_arquivo).from_select(
+            COLUNAS, select(*origem).where(Frequencia.id.in_(ids))
+        ))
+        db.session.execute(delete(Frequencia).where(Frequencia.id.in_(ids)).execution_options(synchronize_session=False))
+        db.session.commit()
+        total += len(ids)
+        if progresso:
+            progresso(total)
+        if len(ids) < lote:
+            return total
+
+
+def ultimo_arquivado():
+    return db.session.execute(select(func.max(frequencia_arquivo.c.data_hora))).scalar()
+
+
+def fonte_frequencia(inicio_utc=None):
+    """
+    Entidade de onde ler as frequências a partir de 'inicio_utc' (None = desde
+    o começo): o próprio Frequencia quando o período é todo posterior ao último
+    check-in arquivado, ou Frequencia apontando para a união com
+    frequencia_arquivo. Use como Frequencia: fonte.data_hora, fonte.membro_id...
+    """
+    ultimo = ultimo_arquivado()
+    if ultimo is None or (inicio_utc is not None and inicio_utc > ultimo):
+        return Frequencia
+    todas = union_all(
+        select(*[Frequencia.__table__.c[coluna] for coluna in COLUNAS]),
+        select(*[frequencia_arquivo.c[coluna] for coluna in COLUNAS])
+    ).subquery('frequencia_todas')
+    return aliased(Frequencia, todas)
@@ -0,0 +1,91 @@
+# fitpro_academia/app/busca.py
+
+from sqlalchemy import case, column, func, inspect, select, table
+
+from . import db
+from .models import Instrutor, Membro, normalizar_busca
+
+# Tabela FTS5 (tokenizador trigram) criada pela migração no SQLite. Não faz
+# parte dos modelos; é mantida pelos triggers sobre membro.nome_busca.
+membro_fts = table('membro_fts', column('rowid'), column('membro_fts'))
+
+# O índice trigram só ajuda em palavras com pelo menos 3 letras
+TAMANHO_MINIMO_TRIGRAMA = 3
+
+_fts_disponivel = {}
+
+
+def _tem_fts():
+    """Verifica (uma vez por banco) se a tabela FTS5 existe."""
+    chave = str(db.engine.url)
+    if chave not in _fts_disponivel:
+        _fts_disponivel[chave] = inspect(db.engine).has_table('membro_fts')
+    return _fts_disponivel[chave]
+
+
+def _parece_cpf(termo):
+    return not any(caractere.isalpha() for caractere in termo)
+
+
+def filtro_prefixo(coluna, termo):
+    """Nome começando por 'termo', numa forma que usa o índice comum da coluna."""
+    if db.engine.dialect.name == 'sqlite':
+        # LIKE no SQLite ignora maiúsculas e não usa índice; o intervalo usa
+        return (coluna >= termo) & (coluna < termo + '\U0010ffff')
+    return coluna.startswith(termo, autoescape=True)
+
+
+def _expressao_match(termo):
+    palavras = [palavra for palavra in termo.split() if len(palavra) >= TAMANHO_MINIMO_TRIGRAMA]
+    return ' AND '.join('"%s"' % palavra.replace('"', '""') for palavra in palavras)
+
+
+def filtrar_membros(query, termo):
+    """
+    Aplica a busca da recepção: CPF exato ou nome sem diferenciar acentos e
+    maiúsculas. Retorna (query, relevancia), onde 'relevancia' é uma tupla
+    de expressões para o ORDER BY (melhor resultado primeiro), possivelmente vazia.
+    """
+    termo = termo.strip()
+    if _parece_cpf(termo):
+        return query.filter(Membro.cpf == termo), ()
+
+    normalizado = normalizar_busca(termo)
+    expressao = _expressao_match(normalizado)
+    dialeto = db.engine.dialect.name
+    contem = Membro.nome_busca.contains(normalizado, autoescape=True)
+    # O bm25 não diz muito sobre trigramas e custa caro com muitos resultados,
+    # então a relevância é: nome começando pelo termo, depois nomes mais curtos.
+    relevancia = (case((filtro_prefixo(Membro.nome_busca, normalizado), 0), else_=1), func.length(Membro.nome_busca))
+    if dialeto == 'sqlite' and _tem_fts() and expressao:
+        # O MATCH é resolvido uma vez só, numa subconsulta (um JOIN faria o SQLite
+        # consultar o FTS5 aluno por aluno); o LIKE confere a frase inteira.
+        candidatos = select(membro_fts.c.rowid).where(membro_fts.c.membro_fts.op('MATCH')(expressao))
+        return query.filter(Membro.id.in_(candidatos), contem), relevancia
+    if dialeto == 'postgresql':
+        # LIKE '%...%' usa o índice GIN (gin_trgm_ops) criado pela migração
+        return query.filter(contem), (func.similarity(Membro.nome_busca, normalizado).desc(),)
+    # Sem FTS5, ou só palavras curtas demais para trigramas: LIKE com varredura
+    return query.filter(contem), relevancia
+
+
+def prefixo_membros(query, termo):
+    """
+    Busca por começo do nome (sem acentos) ou do CPF, para os seletores com
+    autocompletar. Retorna (query, coluna de ordenação), ambas cobertas por índice.
+    """
+    termo = termo.strip()
+    if termo and _parece_cpf(termo):
+        return query.filter(filtro_prefixo(Membro.cpf, termo)), Membro.cpf
+    normalizado = normalizar_busca(termo)
+    if normalizado:
+        query = query.filter(filtro_prefixo(Membro.nome_busca, normalizado))
+    return query, Membro.nome_busca
+
+
+def filtrar_instrutores(query, termo):
+    """Busca de instrutores por CPF exato ou nome/especialidade sem acentos."""
+    termo = termo.strip()
+    if _parece_cpf(termo):
+        return query.filter(Instrutor.cpf == termo)
+    return query.filter(Instrutor.busca.contains(normalizar_busca(termo), autoescape=True))
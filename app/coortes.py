@@ -0,0 +1,202 @@
+# fitpro_academia/app/coortes.py
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .arquivamento import fonte_frequencia
+from .models import Matricula, Membro, RetencaoCoorte
+from .resumos import dia_local, intervalo_utc
+
+# Check-ins trazidos do banco por vez (cursor no servidor)
+LINHAS_POR_LOTE = 50000
+
+# Multiplicador que junta (membro_id, mês) num único inteiro: mes * CHAVE_MES + membro_id
+CHAVE_MES = 1 << 32
+
+COLUNAS = ['coorte', 'mes', 'cadastrados', 'matriculados', 'ativos', 'perdidos']
+
+# Os meses são tratados como índices inteiros: meses desde janeiro de 1970 (datetime64[M])
+
+
+def _mes_das_datas(datas):
+    return np.array(datas, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def _mes_local(datas_utc):
+    locais = np.array(datas_utc, dtype='datetime64[s]') - np.timedelta64(3, 'h')
+    return locais.astype('datetime64[M]').astype(np.int64)
+
+
+def _primeiro_dia(mes):
+    return np.datetime64(int(mes), 'M').astype('datetime64[D]').item()
+
+
+def _ultimo_dia(mes):
+    return _primeiro_dia(mes + 1) - timedelta(days=1)
+
+
+def _cobertura(primeiro, ultimo):
+    """
+    Pares (mês, aluno) com matrícula não cancelada cobrindo algum dia do mês,
+    de 'primeiro - 1' até 'ultimo'. Cada matrícula vira uma linha por mês
+    com np.repeat, sem laço por matrícula.
+    """
+    linhas = db.session.execute(
+        select(Matricula.membro_id, Matricula.data_inicio, Matricula.data_fim).where(
+            Matricula.status != 'Cancelada',
+            Matricula.data_fim >= _primeiro_dia(primeiro - 1),
+            Matricula.data_inicio <= _ultimo_dia(ultimo)
+        )
+    ).all()
+    if not linhas:
+        return np.empty(0, dtype=np.int64)
+
+    membros, inicios, fins = zip(*linhas)
+    membros = np.array(membros, dtype=np.int64)
+    inicios = np.maximum(_mes_das_datas(inicios), primeiro - 1)
+    fins = np.minimum(_mes_das_datas(fins), ultimo)
+    quantidade = fins - inicios + 1
+    deslocamento = np.arange(quantidade.sum()) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    meses = np.repeat(inicios, quantidade) + deslocamento
+    return np.unique(meses * CHAVE_MES + np.repeat(membros, quantidade))
+
+
+def _atividade(primeiro, ultimo):
+    """Pares (mês, aluno) com ao menos uma entrada liberada no mês, lidos em lotes de colunas."""
+    inicio_utc, fim_utc = intervalo_utc(_primeiro_dia(primeiro), _ultimo_dia(ultimo))
+    frequencia = fonte_frequencia(inicio_utc)
+    consulta = select(frequencia.data_hora, frequencia.membro_id).where(
+        frequencia.tipo == 'Entrada', frequencia.status == 'Liberado',
+        frequencia.data_hora.between(inicio_utc, fim_utc)
+    )
+    pares = []
+    for lote in db.session.execute(consulta.execution_options(yield_per=LINHAS_POR_LOTE)).partitions():
+        datas, membros = zip(*lote)
+        pares.append(np.unique(_mes_local(datas) * CHAVE_MES + np.array(membros, dtype=np.int64)))
+    return np.unique(np.concatenate(pares)) if pares else np.empty(0, dtype=np.int64)
+
+
+def calcular(meses):
+    """
+    Calcula as linhas do relatório (colunas de RetencaoCoorte, com coorte e
+    mes como índices de mês) dos meses informados, para todas as coortes
+    cadastradas até cada mês. Tudo sai de quatro leituras em bloco: alunos,
+    matrículas, frequências e nada por aluno.
+    """
+    meses = np.array(sorted(meses), dtype=np.int64)
+    membros = db.session.execute(select(Membro.id, Membro.data_cadastro)).all()
+    if not membros or not len(meses):
+        return pd.DataFrame(columns=COLUNAS, dtype=np.int64)
+
+    ids, cadastros = zip(*membros)
+    ids = np.array(ids, dtype=np.int64)
+    ordem = np.argsort(ids)
+    ids, coortes = ids[ordem], _mes_local(cadastros)[ordem]
+
+    def contar(chaves, nome, deslocamento=0):
+        # Conta os pares (mês, aluno) por (coorte, mês + deslocamento), só dos alunos já cadastrados no mês
+        mes, membro = chaves // CHAVE_MES, chaves % CHAVE_MES
+        posicao = np.minimum(np.searchsorted(ids, membro), len(ids) - 1)
+        coorte = coortes[posicao]
+        manter = (ids[posicao] == membro) & (coorte <= mes) & np.isin(mes + deslocamento, meses)
+        return pd.DataFrame({'coorte': coorte[manter], 'mes': mes[manter] + deslocamento}).value_counts().rename(nome)
+
+    cobertos = _cobertura(meses[0], meses[-1])
+    anteriores = cobertos[~np.isin(cobertos + CHAVE_MES, cobertos)]
+
+    tamanhos = pd.Series(coortes).value_counts().rename('cadastrados').rename_axis('coorte').reset_index()
+    tabela = tamanhos.merge(pd.DataFrame({'mes': meses}), how='cross')
+    tabela = tabela[tabela['coorte'] <= tabela['mes']].set_index(['coorte', 'mes'])
+    tabela = tabela.join([
+        contar(cobertos, 'matriculados'),
+        contar(_atividade(meses[0], meses[-1]), 'ativos'),
+        contar(anteriores, 'perdidos', deslocamento=1),
+    ]).fillna(0).astype(np.int64).reset_index()
+    return tabela[COLUNAS]
+
+
+def _gravar_fotos(tabela):
+    """Grava as linhas dos meses fechados. Se outra requisição gravou antes, fica a dela."""
+    if tabela.empty:
+        return
+    try:
+        db.session.execute(insert(RetencaoCoorte), [
+            {'coorte': _primeiro_dia(linha.coorte), 'mes': _primeiro_dia(linha.mes), 'cadastrados': int(linha.cadastrados),
+             'matriculados': int(linha.matriculados), 'ativos': int(linha.ativos), 'perdidos': int(linha.perdidos)}
+            for linha in tabela.itertuples()
+        ])
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+
+
+def tabela_retencao():
+    """
+    Todas as linhas do relatório até o mês atual. Os meses fechados vêm das
+    fotos em RetencaoCoorte (os que faltarem são calculados e gravados); só
+    o mês atual é calculado a cada chamada.
+    """
+    mes_atual = int(_mes_das_datas([dia_local(datetime.utcnow())])[0])
+    primeiro_cadastro = db.session.query(func.min(Membro.data_cadastro)).scalar()
+    if primeiro_cadastro is None:
+        return pd.DataFrame(columns=COLUNAS, dtype=np.int64)
+
+    fechados = set(_mes_das_datas([mes for (mes,) in db.session.query(RetencaoCoorte.mes).distinct()]))
+    faltando = [mes for mes in range(int(_mes_local([primeiro_cadastro])[0]), mes_atual) if mes not in fechados]
+    calculadas = calcular(faltando + [mes_atual])
+    _gravar_fotos(calculadas[calculadas['mes'] < mes_atual])
+
+    fotos = db.session.execute(select(*[getattr(RetencaoCoorte, coluna) for coluna in COLUNAS])).all()
+    fotos = pd.DataFrame(fotos, columns=COLUNAS)
+    if not fotos.empty:
+        fotos['coorte'] = _mes_das_datas(fotos['coorte'].tolist())
+        fotos['mes'] = _mes_das_datas(fotos['mes'].tolist())
+    return pd.concat([fotos, calculadas[calculadas['mes'] == mes_atual]], ignore_index=True).astype(np.int64)
+
+
+def _rotulo(mes):
+    return _primeiro_dia(mes).strftime('%m/%Y')
+
+
+def _porcentagem(parte, todo):
+    return round(100 * float(parte) / float(todo), 1) if todo else 0.0
+
+
+def relatorio(quantidade_meses=12):
+    """
+    Relatório de coortes das últimas 'quantidade_meses' coortes: retenção
+    (matriculados) e atividade (frequentando) mês a mês desde o cadastro, e
+    a evasão de cada mês (perdidos / matriculados no mês anterior).
+    """
+    tabela = tabela_retencao()
+    if tabela.empty:
+        return {'coortes': [], 'evasao': [], 'colunas': 0}
+
+    ultimo = tabela['mes'].max()
+    tabela = tabela.sort_values(['coorte', 'mes'])
+    coortes = []
+    for coorte, linhas in tabela[tabela['coorte'] > ultimo - quantidade_meses].groupby('coorte'):
+        cadastrados = int(linhas['cadastrados'].iloc[0])
+        coortes.append({
+            'coorte': _rotulo(coorte),
+            'cadastrados': cadastrados,
+            'meses': [
+                {'matriculados': int(linha.matriculados), 'retencao': _porcentagem(linha.matriculados, linha.cadastrados),
+                 'ativos': int(linha.ativos), 'atividade': _porcentagem(linha.ativos, linha.cadastrados)}
+                for linha in linhas.itertuples()
+            ],
+        })
+
+    por_mes = tabela.groupby('mes')[['matriculados', 'perdidos']].sum()
+    base = pd.Series(por_mes['matriculados'].reindex(por_mes.index - 1).values, index=por_mes.index)
+    evasao = [
+        {'mes': _rotulo(mes), 'base': int(base[mes]), 'perdidos': int(por_mes.at[mes, 'perdidos']),
+         'taxa': _porcentagem(por_mes.at[mes, 'perdidos'], base[mes])}
+        for mes in por_mes.index[-quantidade_meses:] if not np.isnan(base[mes])
+    ]
+    return {'coortes': coortes, 'evasao': evasao, 'colunas': max(len(coorte['meses']) for coorte in coortes)}
@@ -0,0 +1,68 @@
+# fitpro_academia/app/detalhe_aluno.py
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+
+from . import db, resumos
+from .models import Anamnese, Frequencia, Matricula, Treino, frequencia_arquivo, treinos_membros
+
+# Quantidade de itens de cada seção da página de detalhes
+ULTIMOS_CHECKINS = 3
+LIMITE_HISTORICO_MATRICULAS = 10
+LIMITE_TREINOS = 20
+
+
+def ultimos_checkins(membro_id, limite=ULTIMOS_CHECKINS):
+    """
+    Últimas entradas do aluno (usa o índice membro_id + data_hora). O arquivo
+    só é consultado quando a tabela frequencia não tem entradas suficientes.
+    """
+    checkins = Frequencia.query.filter(
+        Frequencia.membro_id == membro_id, Frequencia.tipo == 'Entrada'
+    ).order_by(Frequencia.data_hora.desc()).limit(limite).all()
+    if len(checkins) < limite:
+        checkins += db.session.execute(
+            select(frequencia_arquivo.c.data_hora, frequencia_arquivo.c.status).where(
+                frequencia_arquivo.c.membro_id == membro_id, frequencia_arquivo.c.tipo == 'Entrada'
+            ).order_by(frequencia_arquivo.c.data_hora.desc()).limit(limite - len(checkins))
+        ).all()
+    return checkins
+
+
+def matriculas_ativas(membro_id):
+    """Matrículas vigentes (status_dinamico 'Ativa' ou 'Vence ...'), da que vence antes para a última."""
+    return Matricula.query.options(joinedload(Matricula.plano)).filter(
+        Matricula.membro_id == membro_id, Matricula.vigente
+    ).order_by(Matricula.data_fim).all()
+
+
+def historico_matriculas(membro_id, limite=LIMITE_HISTORICO_MATRICULAS):
+    """Matrículas vencidas ou canceladas, das mais recentes para as mais antigas."""
+    return Matricula.query.options(joinedload(Matricula.plano)).filter(
+        Matricula.membro_id == membro_id, ~Matricula.vigente
+    ).order_by(Matricula.data_fim.desc()).limit(limite).all()
+
+
+def treinos_do_aluno(membro_id, limite=LIMITE_TREINOS):
+    return Treino.query.join(treinos_membros, treinos_membros.c.treino_id == Treino.id).options(
+        joinedload(Treino.instrutor)
+    ).filter(treinos_membros.c.membro_id == membro_id).order_by(Treino.nome).limit(limite).all()
+
+
+def anamnese_recente(membro_id):
+    """Última anamnese preenchida (as enviadas e ainda não respondidas são ignoradas)."""
+    return Anamnese.query.filter(
+        Anamnese.membro_id == membro_id, Anamnese.data_preenchimento.isnot(None)
+    ).order_by(Anamnese.data_preenchimento.desc()).first()
+
+
+def carregar_detalhe(aluno):
+    """Monta tudo o que a página de detalhes do aluno exibe, com consultas limitadas."""
+    return {
+        'checkins': ultimos_checkins(aluno.id),
+        'matriculas_ativas': matriculas_ativas(aluno.id),
+        'historico_matriculas': historico_matriculas(aluno.id),
+        'treinos': treinos_do_aluno(aluno.id),
+        'anamnese_recente': anamnese_recente(aluno.id),
+        'visitas': resumos.visitas_do_membro(aluno.id),
+    }
@@ -0,0 +1,99 @@
+# fitpro_academia/app/diagnostico.py
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+from . import db
+from .busca import prefixo_membros
+from .models import Frequencia, Matricula, Membro, Pagamento
+from .paginacao import consulta_contagem, consulta_pagina
+from .painel import consulta_cards
+from .routes import consulta_financeiro, consulta_frequencia
+
+
+def _paginas_keyset(descricao, query, coluna, coluna_id, por_pagina, posicao, indice, decrescente=True):
+    """
+    As consultas que paginar_keyset() executa para uma rota: a primeira
+    página, uma página seguinte (comparação por tupla com o cursor) e a
+    contagem limitada.
+    """
+    return [
+        (f"{descricao}: primeira página",
+         consulta_pagina(query, coluna, coluna_id, por_pagina, decrescente=decrescente).statement, indice),
+        (f"{descricao}: página seguinte",
+         consulta_pagina(query, coluna, coluna_id, por_pagina, posicao, decrescente).statement, indice),
+        (f"{descricao}: contagem", consulta_contagem(query, 1000), indice),
+    ]
+
+
+def _consultas_criticas():
+    """
+    Monta as consultas das rotas mais acessadas com os mesmos construtores que
+    as rotas usam, e o índice que cada uma deve usar. Retorna uma lista de
+    (descrição, statement, nome do índice).
+    """
+    agora = datetime.utcnow()
+    hoje = date.today()
+    cards = consulta_cards((agora - timedelta(hours=3)).date())
+
+    consultas = [
+        ("index(): cards (check-ins de hoje)", cards, 'ix_frequencia_data_hora_tipo_status'),
+        ("index(): cards (receita de hoje e pendentes)", cards, 'ix_pagamento_status_data_pagamento'),
+        ("index(): cards (matrículas vencendo em 7 dias)", cards, 'ix_matricula_ativa_data_fim'),
+    ]
+    consultas += _paginas_keyset("frequencia(): registros de hoje por status",
+                                 consulta_frequencia('Liberado'), Frequencia.data_hora, Frequencia.id,
+                                 5, (agora, 1), 'ix_frequencia_data_hora_tipo_status')
+    consultas += _paginas_keyset("financeiro(): todos os pagamentos não arquivados",
+                                 consulta_financeiro('todos', 'todos'), Pagamento.data_pagamento, Pagamento.id,
+                                 15, (agora, 1), 'ix_pagamento_nao_arquivado_data_pagamento')
+    consultas += _paginas_keyset("financeiro(): pagamentos por status no período",
+                                 consulta_financeiro('Pendente', 'ultimos_3_meses'), Pagamento.data_pagamento,
+                                 Pagamento.id, 15, (agora, 1), 'ix_pagamento_status_data_pagamento')
+
+    query, coluna = prefixo_membros(Membro.query.filter(Membro.status == 'Ativo'), 'jo')
+    consultas += [
+        ("matriculas(): matrículas ativas por vencimento",
+         select(Matricula).where(Matricula.status == 'Ativa', Matricula.data_fim >= hoje).order_by(Matricula.data_fim).limit(4),
+         'ix_matricula_ativa_data_fim'),
+        ("lista_alunos(): alunos ativos por nome",
+         select(Membro).where(Membro.status == 'Ativo').order_by(Membro.nome).limit(10),
+         'ix_membro_status_nome'),
+        ("api_busca_alunos(): busca por começo do nome",
+         consulta_pagina(query, coluna, Membro.id, 10, decrescente=False).statement,
+         'ix_membro_status_nome_busca'),
+    ]
+    return consultas
+
+
+def plano_de_execucao(statement):
+    """Executa EXPLAIN (ou EXPLAIN QUERY PLAN no SQLite) e retorna o plano em texto."""
+    conexao = db.session.connection()
+    dialeto = conexao.dialect
+    compilado = statement.compile(dialect=dialeto)
+    parametros = compilado.params
+    if compilado.positional:
+        parametros = tuple(parametros[nome] for nome in compilado.positiontup)
+
+    if dialeto.name == 'sqlite':
+        linhas = conexao.exec_driver_sql(f'EXPLAIN QUERY PLAN {compilado}', parametros).fetchall()
+        return '\n'.join(linha[-1] for linha in linhas)
+
+    # Em tabelas pequenas o PostgreSQL prefere varrer a tabela inteira;
+    # desligar o seq scan mostra se o índice pode ser usado.
+    conexao.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    linhas = conexao.exec_driver_sql(f'EXPLAIN {compilado}', parametros).fetchall()
+    return '\n'.join(linha[0] for linha in linhas)
+
+
+def verificar_indices():
+    """Retorna uma lista de (descrição, índice esperado, usou o índice?, plano)."""
+    resultados = []
+    try:
+        for descricao, statement, indice in _consultas_criticas():
+            plano = plano_de_execucao(statement)
+            resultados.append((descricao, indice, indice in plano, plano))
+    finally:
+        db.session.rollback()
+    return resultados
@@ -0,0 +1,164 @@
+# fitpro_academia/app/elegibilidade.py
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .models import AlteracaoElegibilidade, Membro, Matricula
+
+
+class IndiceElegibilidade:
+    """
+    Índice em memória (por processo) que responde se um aluno pode entrar
+    sem montar a consulta de matrículas. Mapeia membro_id -> (nome, válido
+    até) e também PIN -> membro_id, para o teclado do quiosque.
+
+    É montado na inicialização. As rotas que mudam matrículas chamam
+    atualizar(), que além de corrigir o índice deste worker grava o aluno em
+    AlteracaoElegibilidade; a cada leitura, cada worker busca as alterações
+    com id maior que a última que aplicou (uma consulta pela chave primária)
+    e relê só esses alunos. Uma thread ainda remonta o índice inteiro a cada
+    ELEGIBILIDADE_TTL segundos (0 desliga), fora das requisições.
+    """
+
+    # Alterações mais antigas que isso são apagadas na remontagem completa
+    GUARDAR_ALTERACOES = timedelta(days=1)
+
+    def __init__(self):
+        self._alunos = {}
+        self._pins = {}
+        self._pin_do_membro = {}
+        self._ultima_alteracao = 0
+        self._carregado = False
+        self._lock = threading.Lock()
+        # Só uma remontagem completa por vez (thread de fundo ou primeira leitura)
+        self._recarga = threading.Lock()
+        self._thread = None
+        self.ttl = 300
+
+    def init_app(self, app):
+        self.ttl = app.config.get('ELEGIBILIDADE_TTL', 300)
+        with app.app_context():
+            try:
+                self.carregar()
+            except SQLAlchemyError:
+                # O banco ainda não existe (ex.: antes do 'flask db upgrade').
+                # O índice será montado no primeiro check-in.
+                db.session.rollback()
+        if self.ttl and self._thread is None:
+            self._thread = threading.Thread(target=self._executar, args=(app,), name='indice-elegibilidade', daemon=True)
+            self._thread.start()
+
+    def _executar(self, app):
+        while True:
+            time.sleep(self.ttl)
+            with app.app_context():
+                try:
+                    self.carregar()
+                    db.session.execute(delete(AlteracaoElegibilidade).where(
+                        AlteracaoElegibilidade.data_registro < datetime.utcnow() - self.GUARDAR_ALTERACOES
+                    ))
+                    db.session.commit()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    app.logger.exception('Falha ao remontar o índice de elegibilidade; nova tentativa em seguida.')
+
+    def _consulta(self):
+        # Um aluno sem matrícula 'Ativa' fica com "válido até" = None
+        return db.session.query(
+            Membro.id, Membro.nome, Membro.pin, func.max(Matricula.data_fim)
+        ).outerjoin(
+            Matricula, (Matricula.membro_id == Membro.id) & (Matricula.status == 'Ativa')
+        ).group_by(Membro.id, Membro.nome, Membro.pin)
+
+    def carregar(self, se_vazio=False):
+        """
+        Monta o índice completo com uma única consulta. Com 'se_vazio', não
+        faz nada se outra thread já montou o índice enquanto esta esperava.
+        """
+        with self._recarga:
+            if se_vazio and self._carregado:
+                return
+            # Lida antes da consulta: o que mudar durante ela é aplicado de novo depois
+            ultima = db.session.query(func.max(AlteracaoElegibilidade.id)).scalar() or 0
+            alunos, pins = {}, {}
+            for membro_id, nome, pin, valido_ate in self._consulta():
+                alunos[membro_id] = (nome, valido_ate)
+                pins[pin] = membro_id
+            with self._lock:
+                self._alunos = alunos
+                self._pins = pins
+                self._pin_do_membro = {membro_id: pin for pin, membro_id in pins.items()}
+                self._ultima_alteracao = max(self._ultima_alteracao, ultima)
+                self._carregado = True
+
+    def _reler(self, ids):
+        """Relê do banco apenas os alunos informados."""
+        linhas = self._consulta().filter(Membro.id.in_(ids)).all()
+        with self._lock:
+            for membro_id in ids:
+                self._alunos.pop(membro_id, None)
+                self._pins.pop(self._pin_do_membro.pop(membro_id, None), None)
+            for membro_id, nome, pin, valido_ate in linhas:
+                self._alunos[membro_id] = (nome, valido_ate)
+                self._pins[pin] = membro_id
+                self._pin_do_membro[membro_id] = pin
+
+    def atualizar(self, *membro_ids):
+        """
+        Recarrega os alunos informados e avisa os outros workers (grava as
+        alterações e faz o commit). Deve ser chamado após o commit da mudança.
+        """
+        ids = {membro_id for membro_id in membro_ids if membro_id is not None}
+        if not ids:
+            return
+        db.session.execute(insert(AlteracaoElegibilidade), [{'membro_id': membro_id} for membro_id in ids])
+        db.session.commit()
+        self._reler(ids)
+
+    def _sincronizar(self):
+        """Aplica as alterações gravadas por qualquer worker desde a última leitura."""
+        if not self._carregado:
+            self.carregar(se_vazio=True)
+            return
+        alteracoes = db.session.query(AlteracaoElegibilidade.id, AlteracaoElegibilidade.membro_id).filter(
+            AlteracaoElegibilidade.id > self._ultima_alteracao
+        ).all()
+        if alteracoes:
+            self._reler({membro_id for _, membro_id in alteracoes})
+            with self._lock:
+                self._ultima_alteracao = max(self._ultima_alteracao, max(id_ for id_, _ in alteracoes))
+
+    def consultar(self, membro_id):
+        """Retorna (nome, válido até) ou None se o aluno não existir."""
+        self._sincronizar()
+        return self._alunos.get(membro_id)
+
+    def em_memoria(self, membro_id):
+        """Como consultar(), sem buscar alterações no banco (ex.: só para mostrar o nome)."""
+        return self._alunos.get(membro_id)
+
+    def membro_do_pin(self, pin):
+        """Retorna o membro_id dono do PIN, ou None."""
+        self._sincronizar()
+        return self._pins.get(pin)
+
+
+indice_elegibilidade = IndiceElegibilidade()
+
+
+def verificar_acesso(membro_id, dia=None):
+    """
+    Regra de liberação usada pelo quiosque: o aluno precisa ter uma matrícula
+    'Ativa' que não tenha vencido. Retorna (nome, liberado) ou None.
+    """
+    registro = indice_elegibilidade.consultar(membro_id)
+    if registro is None:
+        return None
+    nome, valido_ate = registro
+    dia = dia or date.today()
+    return nome, valido_ate is not None and valido_ate >= dia
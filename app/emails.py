@@ -0,0 +1,155 @@
+# fitpro_academia/app/emails.py
+
+import smtplib
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_mail import Message
+
+from . import db, mail
+from .models import EmailPendente
+
+# Momento (time.monotonic) a partir do qual o próximo e-mail pode sair
+_proximo_envio = 0.0
+
+
+def enfileirar(destinatario, assunto, texto=None, html=None, anexo=None):
+    """
+    Coloca um e-mail na fila de envio. Não faz commit: o e-mail entra na
+    transação de quem chamou. 'anexo' é uma tupla (nome, tipo, bytes).
+    """
+    email = EmailPendente(destinatario=destinatario, assunto=assunto, corpo_texto=texto, corpo_html=html)
+    if anexo is not None:
+        email.anexo_nome, email.anexo_tipo, email.anexo_dados = anexo
+    db.session.add(email)
+    return email
+
+
+def _mensagem(email):
+    msg = Message(
+        subject=email.assunto,
+        sender=('GymFlow', current_app.config['MAIL_USERNAME']),
+        recipients=[email.destinatario]
+    )
+    msg.body = email.corpo_texto
+    msg.html = email.corpo_html
+    if email.anexo_dados is not None:
+        msg.attach(email.anexo_nome, email.anexo_tipo, email.anexo_dados)
+    return msg
+
+
+def _adiar(email, erro, agora):
+    """Agenda uma nova tentativa com espera exponencial, ou desiste após o limite."""
+    email.tentativas += 1
+    email.ultimo_erro = str(erro)[:1000]
+    if email.tentativas >= current_app.config.get('EMAIL_MAX_TENTATIVAS', 6):
+        email.status = 'Falhou'
+        return
+    espera = current_app.config.get('EMAIL_ESPERA_INICIAL', 60) * 2 ** (email.tentativas - 1)
+    email.proxima_tentativa = agora + timedelta(seconds=min(espera, 6 * 3600))
+
+
+def _aguardar_vez():
+    """Espaça os envios para respeitar EMAIL_POR_MINUTO (0 = sem limite) do servidor SMTP."""
+    global _proximo_envio
+    por_minuto = current_app.config.get('EMAIL_POR_MINUTO', 0)
+    if not por_minuto:
+        return
+    agora = time.monotonic()
+    if _proximo_envio > agora:
+        time.sleep(_proximo_envio - agora)
+        agora = _proximo_envio
+    _proximo_envio = agora + 60.0 / por_minuto
+
+
+def _proximo_pendente(agora):
+    """
+    O próximo e-mail com envio vencido, travado até o commit. SKIP LOCKED
+    (PostgreSQL) permite mais de um worker sem enviar o mesmo e-mail duas vezes.
+    """
+    return EmailPendente.query.filter(
+        EmailPendente.status == 'Pendente', EmailPendente.proxima_tentativa <= agora
+    ).order_by(EmailPendente.proxima_tentativa, EmailPendente.id).limit(1).with_for_update(skip_locked=True).first()
+
+
+def enviar_pendentes(limite=None):
+    """
+    Envia até 'limite' e-mails da fila usando uma única conexão SMTP.
+    Retorna (enviados, adiados). Cada e-mail é travado, enviado e commitado
+    sozinho: se o processo morrer no meio, só o e-mail da vez pode sair de
+    novo. Se a conexão cair, o e-mail da vez ganha uma nova tentativa
+    agendada e o restante continua na fila.
+    """
+    limite = limite or current_app.config.get('EMAIL_LOTE', 50)
+    agora = datetime.utcnow()
+    email = _proximo_pendente(agora)
+    if email is None:
+        db.session.rollback()
+        return 0, 0
+
+    enviados = adiados = 0
+    try:
+        with mail.connect() as conexao:
+            while email is not None:
+                _aguardar_vez()
+                try:
+                    conexao.send(_mensagem(email))
+                except smtplib.SMTPServerDisconnected:
+                    raise
+                except smtplib.SMTPException as erro:
+                    # Problema só com este e-mail (ex.: destinatário recusado)
+                    _adiar(email, erro, agora)
+                    adiados += 1
+                except OSError:
+                    raise # Conexão perdida (SMTPException também é um OSError, por isso vem depois)
+                except Exception as erro:
+                    # Erro inesperado ao montar ou enviar a mensagem: não trava a fila
+                    current_app.logger.exception('Falha ao enviar o e-mail %s; nova tentativa agendada.', email.id)
+                    _adiar(email, erro, agora)
+                    adiados += 1
+                else:
+                    email.status = 'Enviado'
+                    email.data_envio = datetime.utcnow()
+                    enviados += 1
+                db.session.commit()
+                email = _proximo_pendente(agora) if enviados + adiados < limite else None
+    except (smtplib.SMTPException, OSError) as erro:
+        current_app.logger.warning('Falha na conexão SMTP (%s); os e-mails pendentes continuam na fila.', erro)
+        if email is not None:
+            _adiar(email, erro, agora)
+            adiados += 1
+
+    db.session.commit()
+    return enviados, adiados
+
+
+def processar_fila(continuo=False, intervalo=10, limite=None, progresso=None):
+    """
+    Envia os e-mails da fila, lote por lote, até não haver mais nenhum com
+    envio vencido. Com 'continuo', fica verificando a fila a cada 'intervalo'
+    segundos. 'progresso(enviados, adiados)' recebe os totais após cada lote.
+    Retorna (enviados, adiados).
+    """
+    total_enviados = total_adiados = 0
+    while True:
+        try:
+            enviados, adiados = enviar_pendentes(limite)
+        except Exception:
+            if not continuo:
+                raise
+            # No modo contínuo, uma falha (ex.: banco indisponível) não derruba o worker
+            db.session.rollback()
+            current_app.logger.exception('Falha ao processar a fila de e-mails; nova tentativa em %d s.', intervalo)
+            time.sleep(intervalo)
+            continue
+        total_enviados += enviados
+        total_adiados += adiados
+        if enviados or adiados:
+            current_app.logger.info('Fila de e-mails: %d enviado(s), %d adiado(s).', enviados, adiados)
+            if progresso:
+                progresso(total_enviados, total_adiados)
+            continue
+        if not continuo:
+            return total_enviados, total_adiados
+        time.sleep(intervalo)
@@ -0,0 +1,92 @@
+# fitpro_academia/app/eventos.py
+
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CanalEventos:
+    """
+    Pub/sub em memória (por processo) para o stream /eventos (Server-Sent
+    Events). Cada aba aberta assina o canal e recebe uma fila própria; quem
+    publica (a gravação de frequências) nunca espera: se a fila de uma aba
+    lenta encher, os eventos mais novos dela são descartados.
+
+    Como o canal é por processo, o stream só recebe os eventos gravados no
+    mesmo worker: por isso o gunicorn.conf.py usa um único worker, com
+    threads. Cada conexão aberta ocupa uma thread enquanto dura, e o stream é
+    encerrado após EVENTOS_DURACAO segundos; o navegador (EventSource)
+    reconecta sozinho. Os eventos do intervalo se perdem, então cada stream
+    começa com o estado atual (ver stream()).
+    """
+
+    def __init__(self):
+        self._assinantes = set()
+        self._lock = threading.Lock()
+        self.max_fila = 100
+        self.heartbeat = 15
+        self.duracao = 60
+
+    def init_app(self, app):
+        self.max_fila = app.config.get('EVENTOS_MAX_FILA', 100)
+        self.heartbeat = app.config.get('EVENTOS_HEARTBEAT', 15)
+        self.duracao = app.config.get('EVENTOS_DURACAO', 60)
+
+    @contextmanager
+    def assinar(self):
+        fila = queue.Queue(maxsize=self.max_fila)
+        with self._lock:
+            self._assinantes.add(fila)
+        try:
+            yield fila
+        finally:
+            with self._lock:
+                self._assinantes.discard(fila)
+
+    def tem_assinantes(self):
+        with self._lock:
+            return bool(self._assinantes)
+
+    @staticmethod
+    def _mensagem(evento, dados):
+        return f"event: {evento}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+    def publicar(self, evento, dados):
+        """Envia o evento (nome, dict serializável em JSON) para todas as abas abertas."""
+        mensagem = self._mensagem(evento, dados)
+        with self._lock:
+            assinantes = list(self._assinantes)
+        for fila in assinantes:
+            try:
+                fila.put_nowait(mensagem)
+            except queue.Full:
+                pass
+
+    def stream(self, iniciais=()):
+        """
+        Gerador com as mensagens SSE de uma assinatura, por no máximo
+        EVENTOS_DURACAO segundos. Começa com os eventos 'iniciais' ([(nome,
+        dados)], o estado atual das páginas). Sem eventos por
+        EVENTOS_HEARTBEAT segundos, envia um comentário para manter a conexão
+        aberta (e descobrir quando o navegador fechou a aba). O 'retry' diz ao
+        navegador para reconectar logo depois que o stream termina.
+        """
+        fim = time.monotonic() + self.duracao
+        with self.assinar() as fila:
+            yield "retry: 1000\n\n"
+            for evento, dados in iniciais:
+                yield self._mensagem(evento, dados)
+            while True:
+                restante = fim - time.monotonic()
+                if restante <= 0:
+                    return
+                try:
+                    yield fila.get(timeout=min(self.heartbeat, restante))
+                except queue.Empty:
+                    if time.monotonic() < fim:
+                        yield ": ping\n\n"
+
+
+canal_eventos = CanalEventos()
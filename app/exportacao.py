@@ -0,0 +1,121 @@
+# fitpro_academia/app/exportacao.py
+
+import csv
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from openpyxl import Workbook
+from sqlalchemy import select
+
+from . import db
+from .arquivamento import fonte_frequencia
+from .models import Matricula, Membro, Pagamento, Plano
+
+# Quantidade de linhas buscadas do banco por vez (cursor no servidor)
+LINHAS_POR_LOTE = 2000
+
+
+def _local(data_hora):
+    return data_hora - timedelta(hours=3) if data_hora else None
+
+
+def _consulta_frequencia(inicio_utc, fim_utc):
+    frequencia = fonte_frequencia(inicio_utc)
+    return select(
+        frequencia.data_hora, Membro.nome, Membro.cpf, frequencia.tipo, frequencia.status
+    ).join(Membro, Membro.id == frequencia.membro_id).where(
+        frequencia.data_hora.between(inicio_utc, fim_utc)
+    ).order_by(frequencia.data_hora, frequencia.id)
+
+
+def _consulta_pagamentos(inicio_utc, fim_utc):
+    return select(
+        Pagamento.data_pagamento, Membro.nome, Membro.cpf, Plano.nome, Pagamento.valor,
+        Pagamento.metodo_pagamento, Pagamento.numero_parcelas, Pagamento.status
+    ).join(Matricula, Matricula.id == Pagamento.matricula_id).join(
+        Membro, Membro.id == Matricula.membro_id
+    ).join(Plano, Plano.id == Matricula.plano_id).where(
+        Pagamento.data_pagamento.between(inicio_utc, fim_utc)
+    ).order_by(Pagamento.data_pagamento, Pagamento.id)
+
+
+def _consulta_cadastros(inicio_utc, fim_utc):
+    return select(
+        Membro.data_cadastro, Membro.nome, Membro.cpf, Membro.email, Membro.telefone, Membro.status
+    ).where(
+        Membro.data_cadastro.between(inicio_utc, fim_utc)
+    ).order_by(Membro.data_cadastro, Membro.id)
+
+
+# nome do conjunto -> (título da aba, cabeçalho, função que monta a consulta)
+CONJUNTOS = {
+    'frequencia': ('Check-ins', ['Data/Hora', 'Aluno', 'CPF', 'Tipo', 'Status'], _consulta_frequencia),
+    'pagamentos': ('Pagamentos', ['Data', 'Aluno', 'CPF', 'Plano', 'Valor (R$)', 'Método',
+                                  'Parcelas', 'Status'], _consulta_pagamentos),
+    'cadastros': ('Cadastros', ['Data de Cadastro', 'Nome', 'CPF', 'E-mail', 'Telefone', 'Status'], _consulta_cadastros),
+}
+
+
+def _linhas(conjunto, inicio_utc, fim_utc):
+    """
+    Percorre as linhas do conjunto em lotes, com o cursor do lado do servidor
+    (stream_results), convertendo a primeira coluna para o horário local.
+    """
+    consulta = CONJUNTOS[conjunto][2](inicio_utc, fim_utc)
+    resultado = db.session.execute(consulta.execution_options(yield_per=LINHAS_POR_LOTE))
+    for lote in resultado.partitions():
+        yield [(_local(linha[0]),) + tuple(linha[1:]) for linha in lote]
+
+
+def gerar_csv(conjunto, inicio_utc, fim_utc):
+    """Gera o CSV (separado por ';', como o Excel em português espera) em pedaços."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+
+    # O BOM faz o Excel abrir o arquivo como UTF-8
+    buffer.write('\ufeff')
+    escritor.writerow(CONJUNTOS[conjunto][1])
+    for lote in _linhas(conjunto, inicio_utc, fim_utc):
+        for linha in lote:
+            escritor.writerow([
+                valor.strftime('%d/%m/%Y %H:%M') if hasattr(valor, 'strftime') else valor
+                for valor in linha
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    restante = buffer.getvalue()
+    if restante:
+        yield restante.encode('utf-8')
+
+
+def gerar_xlsx(inicio_utc, fim_utc, tamanho_pedaco=64 * 1024):
+    """
+    Gera uma planilha com uma aba por conjunto usando o modo write-only do
+    openpyxl (as linhas vão para arquivos temporários, não para a memória).
+    O arquivo final é enviado em pedaços e apagado em seguida.
+    """
+    planilha = Workbook(write_only=True)
+    for conjunto, (titulo, cabecalho, _) in CONJUNTOS.items():
+        aba = planilha.create_sheet(title=titulo)
+        aba.append(cabecalho)
+        for lote in _linhas(conjunto, inicio_utc, fim_utc):
+            for linha in lote:
+                aba.append([float(valor) if isinstance(valor, Decimal) else valor for valor in linha])
+
+    descritor, caminho = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descritor)
+    try:
+        planilha.save(caminho)
+        with open(caminho, 'rb') as arquivo:
+            while True:
+                pedaco = arquivo.read(tamanho_pedaco)
+                if not pedaco:
+                    break
+                yield pedaco
+    finally:
+        os.remove(caminho)
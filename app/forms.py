@@ -1,14 +1,16 @@
 # fitpro_academia/app/forms.py
 
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import (StringField, SubmitField, DateField, TextAreaField, 
                      SelectField, PasswordField, BooleanField)
 from wtforms import (StringField, SubmitField, DateField, TextAreaField, 
                      SelectField, SelectMultipleField, PasswordField, 
-                     BooleanField, widgets)
+                     BooleanField, IntegerField, widgets)
 from wtforms.validators import DataRequired, Email, Length, ValidationError
 from datetime import datetime
-from .models import Membro
+from . import db, pins
+from .models import Membro, treinos_membros
 from .models import Instrutor
 # A importação da biblioteca fica comentada até ser necessária
 # from validate_docbr import CPF
@@ -37,6 +39,14 @@ class CadastroAlunoForm(FlaskForm):
         if Membro.query.filter_by(cpf=cpf.data).first():
             raise ValidationError('Este CPF já está cadastrado.')
 
+    def validate_pin(self, pin):
+        if self.aluno_original and self.aluno_original.pin == pin.data:
+            return
+        if not pin.data.isdigit():
+            raise ValidationError('O PIN deve ter apenas números.')
+        if not pins.disponivel(pin.data):
+            raise ValidationError('Este PIN já está em uso.')
+
     def validate_email(self, email):
         if self.aluno_original and self.aluno_original.email == email.data:
             return
@@ -44,8 +54,17 @@ class CadastroAlunoForm(FlaskForm):
             raise ValidationError('Este e-mail já está cadastrado.')
 
 
+def _aluno_ativo(field):
+    """Busca o aluno escolhido no seletor (uma consulta pela chave primária)."""
+    aluno = db.session.get(Membro, field.data)
+    if aluno is None or aluno.status != 'Ativo':
+        raise ValidationError('Selecione um aluno ativo da lista.')
+    return aluno
+
+
 class NovaMatriculaForm(FlaskForm):
-    membro = SelectField('Aluno', coerce=int, validators=[DataRequired()])
+    # O aluno é escolhido pelo seletor com busca (/api/alunos/busca); aqui vem só o id
+    membro = IntegerField('Aluno', widget=widgets.HiddenInput(), validators=[DataRequired()])
     plano = SelectField('Plano', coerce=int, validators=[DataRequired()])
     data_inicio = DateField('Data de Início', format='%Y-%m-%d', validators=[DataRequired()], default=datetime.today)
     metodo_pagamento = SelectField('Método de Pagamento', choices=[
@@ -57,6 +76,9 @@ class NovaMatriculaForm(FlaskForm):
     numero_parcelas = SelectField('Número de Parcelas', coerce=int, default=1)
     submit = SubmitField('Criar Matrícula')
 
+    def validate_membro(self, membro):
+        self.aluno = _aluno_ativo(membro)
+
 
 class CheckinForm(FlaskForm):
     busca = StringField('Registrar Entrada do Aluno por Nome ou CPF', validators=[DataRequired()])
@@ -103,9 +125,27 @@ class TreinoForm(FlaskForm):
 
 
 class AssociarTreinoForm(FlaskForm):
-    membro = SelectField('Selecione o Aluno', coerce=int, validators=[DataRequired()])
+    membro = IntegerField('Selecione o Aluno', widget=widgets.HiddenInput(), validators=[DataRequired()])
     submit = SubmitField('Associar Aluno')
 
+    def __init__(self, treino=None, *args, **kwargs):
+        super(AssociarTreinoForm, self).__init__(*args, **kwargs)
+        self.treino = treino
+
+    def validate_membro(self, membro):
+        self.aluno = _aluno_ativo(membro)
+        ja_associado = db.session.query(treinos_membros.c.membro_id).filter_by(
+            membro_id=self.aluno.id, treino_id=self.treino.id
+        ).first()
+        if ja_associado:
+            raise ValidationError('Este aluno já está neste treino.')
+
+
+class ImportarAlunosForm(FlaskForm):
+    arquivo = FileField('Planilha de Alunos (.csv ou .xlsx)', validators=[
+        FileRequired(), FileAllowed(['csv', 'xlsx'], 'Envie um arquivo .csv ou .xlsx.')
+    ])
+    submit = SubmitField('Importar Alunos')
 
 class AvisoForm(FlaskForm):
     conteudo = TextAreaField('Conteúdo do Aviso', validators=[DataRequired()], render_kw={"rows": 5})
@@ -0,0 +1,283 @@
+# fitpro_academia/app/frequencias.py
+
+import atexit
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from . import db, resumos
+from .elegibilidade import indice_elegibilidade
+from .eventos import canal_eventos
+from .models import Frequencia, Matricula, Membro
+from .ocupacao import contador_ocupacao
+from .painel import cache_painel
+
+
+class GravadorFrequencia:
+    """
+    Ponto único de gravação dos registros de Frequencia.
+
+    Por padrão cada registro é gravado (e commitado) na hora. Com
+    FREQUENCIA_BUFFER_ATIVO ligado, os registros entram numa fila em memória
+    e uma thread grava tudo num único INSERT multi-linhas a cada
+    FREQUENCIA_BUFFER_INTERVALO_MS milissegundos ou quando a fila chega a
+    FREQUENCIA_BUFFER_MAX_LINHAS. Assim o quiosque não espera o fsync do banco.
+
+    Um lote que falha volta para o começo da fila. Depois de
+    FREQUENCIA_BUFFER_TENTATIVAS falhas seguidas ele é gravado linha a linha,
+    e as linhas recusadas pelo banco (ex.: aluno apagado nesse meio tempo)
+    são descartadas e registradas no log, para não travar a fila. Com o banco
+    fora do ar, a fila cresce até FREQUENCIA_BUFFER_MAX_FILA; daí em diante
+    cada registro é gravado na hora (e o erro chega a quem registrou).
+    """
+
+    # Mantém cada INSERT abaixo do limite de 999 parâmetros do SQLite antigo
+    LINHAS_POR_INSERT = 200
+
+    def __init__(self):
+        self._fila = []
+        self._lock = threading.Lock()
+        self._acordar = threading.Event()
+        self._thread = None
+        self._app = None
+        self.ativo = False
+        self.intervalo = 0.5
+        self.max_linhas = 200
+        self.max_fila = 10000
+        self.max_tentativas = 5
+        self._falhas = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.ativo = app.config.get('FREQUENCIA_BUFFER_ATIVO', False)
+        self.intervalo = app.config.get('FREQUENCIA_BUFFER_INTERVALO_MS', 500) / 1000
+        self.max_linhas = app.config.get('FREQUENCIA_BUFFER_MAX_LINHAS', 200)
+        self.max_fila = app.config.get('FREQUENCIA_BUFFER_MAX_FILA', 10000)
+        self.max_tentativas = app.config.get('FREQUENCIA_BUFFER_TENTATIVAS', 5)
+        if self.ativo and self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name='gravador-frequencia', daemon=True)
+            self._thread.start()
+            # Garante que nada fique na fila quando o processo for encerrado
+            atexit.register(self.esvaziar)
+
+    def registrar(self, membro_id, tipo, status, data_hora=None):
+        """
+        Registra uma entrada/saída ('Entrada' ou 'Saída'). A hora é a do
+        momento do registro, a menos que 'data_hora' (em UTC) seja informada.
+        """
+        linha = {
+            'membro_id': membro_id,
+            'tipo': tipo,
+            'status': status,
+            'data_hora': data_hora or datetime.utcnow(),
+        }
+        if not self.ativo:
+            self.gravar([linha])
+            return
+
+        with self._lock:
+            lotada = len(self._fila) >= self.max_fila
+            if not lotada:
+                self._fila.append(linha)
+                cheia = len(self._fila) >= self.max_linhas
+        if lotada:
+            self.gravar([linha])
+        elif cheia:
+            self._acordar.set()
+
+    def gravar(self, linhas):
+        """
+        Insere as linhas com INSERTs multi-linhas, atualiza os resumos diários
+        e por aluno na mesma transação e faz um único commit.
+        """
+        for i in range(0, len(linhas), self.LINHAS_POR_INSERT):
+            db.session.execute(insert(Frequencia).values(linhas[i:i + self.LINHAS_POR_INSERT]))
+        resumos.registrar_frequencias(linhas)
+        resumos.registrar_visitas(linhas)
+        db.session.commit()
+        cache_painel.invalidar()
+        contador_ocupacao.registrar(linhas)
+        self._publicar(linhas)
+
+    @staticmethod
+    def _publicar(linhas):
+        """
+        Avisa as páginas abertas (stream /eventos) dos registros de hoje: um
+        evento 'frequencia' por registro e um 'cards' com o total de check-ins
+        de hoje (o valor absoluto, para a página nunca ficar defasada). O nome
+        vem do índice em memória, sem SELECT.
+        """
+        hoje_local = (datetime.utcnow() - timedelta(hours=3)).date()
+        entradas = 0
+        for linha in sorted(linhas, key=lambda linha: linha['data_hora']):
+            hora_local = linha['data_hora'] - timedelta(hours=3)
+            if hora_local.date() != hoje_local:
+                continue # Leituras de outros dias sincronizadas com atraso
+            aluno = indice_elegibilidade.em_memoria(linha['membro_id'])
+            canal_eventos.publicar('frequencia', {
+                'membro_id': linha['membro_id'],
+                'nome': aluno[0] if aluno else '',
+                'tipo': linha['tipo'],
+                'status': linha['status'],
+                'hora': hora_local.strftime('%H:%M'),
+            })
+            if linha['tipo'] == 'Entrada':
+                entradas += 1
+        if entradas and canal_eventos.tem_assinantes():
+            canal_eventos.publicar('cards', {'total_checkins_hoje': cache_painel.obter()['total_checkins_hoje']})
+
+    def esvaziar(self):
+        """
+        Grava o que estiver na fila. Em caso de erro as linhas voltam para a
+        fila, até o limite de tentativas (ver a docstring da classe).
+        """
+        with self._lock:
+            linhas, self._fila = self._fila, []
+        if not linhas:
+            return
+
+        with self._app.app_context():
+            try:
+                self.gravar(linhas)
+                self._falhas = 0
+                return
+            except Exception:
+                db.session.rollback()
+                self._falhas += 1
+                if self._falhas < self.max_tentativas:
+                    self._devolver(linhas)
+                    raise
+            self._falhas = 0
+            self._gravar_uma_a_uma(linhas)
+
+    def _devolver(self, linhas):
+        with self._lock:
+            self._fila[:0] = linhas
+
+    def _gravar_uma_a_uma(self, linhas):
+        """
+        Isola as linhas que o banco recusa. Outros erros (ex.: conexão
+        perdida) não são culpa da linha: o que falta gravar volta para a fila.
+        """
+        for indice, linha in enumerate(linhas):
+            try:
+                self.gravar([linha])
+            except (IntegrityError, DataError):
+                db.session.rollback()
+                self._app.logger.exception('Registro de frequência descartado após %d tentativas: %r',
+                                           self.max_tentativas, linha)
+            except Exception:
+                db.session.rollback()
+                self._devolver(linhas[indice:])
+                raise
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._fila)
+
+    def _executar(self):
+        while True:
+            self._acordar.wait(self.intervalo)
+            self._acordar.clear()
+            try:
+                self.esvaziar()
+            except Exception:
+                self._app.logger.exception('Falha ao gravar a fila de frequência; nova tentativa em seguida.')
+
+
+gravador_frequencia = GravadorFrequencia()
+
+
+# --- Sincronização em lote (quiosque offline) ---
+
+MAX_LEITURAS_POR_LOTE = 1000
+
+
+def _ler_data_hora(valor):
+    """Converte o horário ISO 8601 enviado pelo quiosque para UTC sem fuso."""
+    data_hora = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    if data_hora.tzinfo is not None:
+        data_hora = data_hora.astimezone(timezone.utc).replace(tzinfo=None)
+    return data_hora
+
+
+def tipo_da_leitura(dados):
+    """'Saída' quando o quiosque está no modo de saída; senão 'Entrada'."""
+    return 'Saída' if str(dados.get('tipo', '')).lower() in ('saída', 'saida') else 'Entrada'
+
+
+def sincronizar_leituras(leituras):
+    """
+    Processa um lote de leituras {'aluno_id', 'data_hora', 'tipo'} feitas pelo
+    quiosque ('tipo' é opcional; sem ele a leitura é uma entrada).
+
+    Todas as matrículas dos alunos do lote são verificadas numa única consulta,
+    usando o dia (horário local) de cada leitura. Os registros são inseridos
+    com a data_hora original num único commit. Leituras já sincronizadas
+    antes (mesmo aluno e mesmo horário) são ignoradas, então o quiosque pode
+    reenviar um lote sem duplicar entradas.
+
+    Retorna uma lista de resultados na mesma ordem das leituras.
+    """
+    resultados = [None] * len(leituras)
+    validas = []
+    for indice, leitura in enumerate(leituras):
+        try:
+            aluno_id = int(leitura['aluno_id'])
+            data_hora = _ler_data_hora(leitura['data_hora'])
+            tipo = tipo_da_leitura(leitura)
+        except (KeyError, TypeError, ValueError):
+            resultados[indice] = {'indice': indice, 'status': 'error', 'message': 'Leitura inválida.'}
+            continue
+        validas.append((indice, aluno_id, data_hora, tipo))
+
+    if not validas:
+        return resultados
+
+    ids = {aluno_id for _, aluno_id, _, _ in validas}
+    alunos = {
+        membro_id: (nome, valido_ate)
+        for membro_id, nome, valido_ate in db.session.query(
+            Membro.id, Membro.nome, func.max(Matricula.data_fim)
+        ).outerjoin(
+            Matricula, (Matricula.membro_id == Membro.id) & (Matricula.status == 'Ativa')
+        ).filter(Membro.id.in_(ids)).group_by(Membro.id, Membro.nome)
+    }
+
+    ja_gravadas = set(db.session.query(Frequencia.membro_id, Frequencia.data_hora).filter(
+        Frequencia.membro_id.in_(ids),
+        Frequencia.data_hora.between(min(d for _, _, d, _ in validas), max(d for _, _, d, _ in validas))
+    ))
+
+    novas = []
+    for indice, aluno_id, data_hora, tipo in validas:
+        if aluno_id not in alunos:
+            resultados[indice] = {'indice': indice, 'aluno_id': aluno_id, 'status': 'error',
+                                  'message': 'Aluno não encontrado.'}
+            continue
+
+        nome, valido_ate = alunos[aluno_id]
+        dia_local = (data_hora - timedelta(hours=3)).date()
+        if tipo == 'Saída':
+            status_checkin = 'Liberado'
+            message = f'Até logo, {nome}!'
+        elif valido_ate is not None and valido_ate >= dia_local:
+            status_checkin = 'Liberado'
+            message = f'Bem-vindo(a), {nome}!'
+        else:
+            status_checkin = 'Bloqueado - Matrícula Inválida'
+            message = f'Acesso Negado para {nome}. Matrícula irregular.'
+
+        duplicada = (aluno_id, data_hora) in ja_gravadas
+        if not duplicada:
+            ja_gravadas.add((aluno_id, data_hora))
+            novas.append({'membro_id': aluno_id, 'tipo': tipo, 'status': status_checkin, 'data_hora': data_hora})
+
+        resultados[indice] = {'indice': indice, 'aluno_id': aluno_id, 'status': status_checkin,
+                              'message': message, 'duplicada': duplicada}
+
+    if novas:
+        gravador_frequencia.gravar(novas)
+    return resultados
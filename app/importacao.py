@@ -0,0 +1,282 @@
+# fitpro_academia/app/importacao.py
+
+import csv
+import io
+import os
+import re
+import zipfile
+from datetime import date, datetime
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+from sqlalchemy import insert
+
+from . import db, pins, resumos
+from .elegibilidade import indice_elegibilidade
+from .models import Membro, normalizar_busca
+
+COLUNAS_OBRIGATORIAS = ['nome', 'cpf', 'data_nascimento', 'email', 'telefone']
+COLUNAS_OPCIONAIS = ['pin', 'endereco']
+
+# Nomes alternativos aceitos no cabeçalho do arquivo (já normalizados)
+APELIDOS = {
+    'nome_completo': 'nome',
+    'data_de_nascimento': 'data_nascimento',
+    'nascimento': 'data_nascimento',
+    'e-mail': 'email',
+    'celular': 'telefone',
+}
+
+# Linhas lidas, validadas e gravadas por vez (um commit por lote)
+LINHAS_POR_LOTE = 1000
+
+
+def _nome_coluna(cabecalho):
+    nome = normalizar_busca(str(cabecalho or '')).replace(' ', '_')
+    return APELIDOS.get(nome, nome)
+
+
+def _texto_celula(valor, coluna):
+    """Converte uma célula do Excel no mesmo texto que viria num CSV."""
+    if valor is None:
+        return ''
+    if isinstance(valor, (datetime, date)):
+        return valor.strftime('%Y-%m-%d')
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    if isinstance(valor, int) and coluna == 'cpf':
+        return f'{valor:011d}' # O Excel guarda o CPF como número e perde os zeros à esquerda
+    return str(valor)
+
+
+def _em_lotes(linhas, colunas, tamanho):
+    """Agrupa as linhas (número da linha, valores) em DataFrames de até 'tamanho' linhas."""
+    lote, primeiro = [], True
+    for numero, valores in linhas:
+        valores = list(valores[:len(colunas)])
+        lote.append([numero] + valores + [''] * (len(colunas) - len(valores)))
+        if len(lote) == tamanho:
+            yield pd.DataFrame(lote, columns=['linha'] + colunas)
+            lote, primeiro = [], False
+    # Um arquivo só com o cabeçalho ainda gera um lote vazio, para as colunas serem conferidas
+    if lote or primeiro:
+        yield pd.DataFrame(lote, columns=['linha'] + colunas)
+
+
+def _colunas(cabecalho):
+    # Colunas sem título ganham um nome qualquer, só para não se repetirem
+    return [_nome_coluna(titulo) or f'_coluna{posicao}' for posicao, titulo in enumerate(cabecalho)]
+
+
+def _lotes_csv(arquivo, tamanho):
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    try:
+        try:
+            # Descobre se o arquivo usa ',' ou ';' (comum no Excel em português)
+            delimitador = csv.Sniffer().sniff(texto.readline(), delimiters=',;\t').delimiter
+        except csv.Error:
+            delimitador = ','
+        texto.seek(0)
+        leitor = csv.reader(texto, delimiter=delimitador)
+        colunas = _colunas(next(leitor, []))
+        # line_num é a linha física do arquivo, mesmo com campos entre aspas que quebram linha
+        yield from _em_lotes(((leitor.line_num, valores) for valores in leitor), colunas, tamanho)
+    except UnicodeDecodeError:
+        raise ValueError('O arquivo não está em UTF-8: salve-o como "CSV UTF-8" e envie de novo.')
+    finally:
+        texto.detach() # Devolve o arquivo original sem fechá-lo
+
+
+def _lotes_xlsx(arquivo, tamanho):
+    try:
+        planilha = load_workbook(arquivo, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError):
+        # KeyError: um .zip válido que não tem as partes de uma planilha
+        raise ValueError('O arquivo .xlsx está corrompido ou não é uma planilha do Excel.')
+    try:
+        linhas = planilha.active.iter_rows(values_only=True)
+        colunas = _colunas(next(linhas, ()))
+        yield from _em_lotes((
+            (numero, [_texto_celula(valor, coluna) for valor, coluna in zip(linha, colunas)])
+            for numero, linha in enumerate(linhas, start=2)
+        ), colunas, tamanho)
+    finally:
+        planilha.close()
+
+
+def ler_lotes(arquivo, nome_arquivo, tamanho=LINHAS_POR_LOTE):
+    """
+    Lê o arquivo (.csv ou .xlsx) aos poucos, em DataFrames de até 'tamanho'
+    linhas, todas as colunas como texto. A coluna 'linha' guarda o número da
+    linha no arquivo (o cabeçalho é a linha 1), para o relatório de recusas.
+    """
+    extensao = os.path.splitext(nome_arquivo)[1].lower()
+    if extensao == '.csv':
+        lotes = _lotes_csv(arquivo, tamanho)
+    elif extensao == '.xlsx':
+        lotes = _lotes_xlsx(arquivo, tamanho)
+    else:
+        raise ValueError('Formato não suportado: envie um arquivo .csv ou .xlsx.')
+
+    try:
+        for lote in lotes:
+            faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in lote.columns]
+            if faltando:
+                raise ValueError(f'Colunas obrigatórias ausentes no arquivo: {", ".join(faltando)}.')
+            campos = lote.reindex(columns=COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS, fill_value='')
+            campos = campos.fillna('').astype(str).apply(lambda coluna: coluna.str.strip())
+            campos.insert(0, 'linha', lote['linha'])
+            # Linhas em branco são ignoradas (mas contam para a numeração)
+            yield campos[(campos[COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS] != '').any(axis=1)].reset_index(drop=True)
+    finally:
+        lotes.close() # Libera o arquivo enquanto ele ainda está aberto
+
+
+def chave_cpf(cpfs):
+    """Só os dígitos do CPF: '123.456.789-00' e '12345678900' são o mesmo aluno."""
+    return cpfs.str.replace(r'\D', '', regex=True)
+
+
+def chaves_existentes():
+    """CPFs (só dígitos), e-mails (minúsculos) e PINs já cadastrados, numa única consulta."""
+    cpfs, emails, pins_usados = set(), set(), set()
+    for cpf, email, pin in db.session.query(Membro.cpf, Membro.email, Membro.pin):
+        cpfs.add(re.sub(r'\D', '', cpf))
+        emails.add(email.lower())
+        pins_usados.add(pin)
+    return cpfs, emails, pins_usados
+
+
+def validar_lote(lote, cpfs, emails, pins_usados, hoje=None):
+    """
+    Valida todas as linhas do lote de uma vez (operações de coluna do pandas),
+    incluindo CPF/e-mail/PIN já cadastrados (os conjuntos de chaves_existentes)
+    ou repetidos no próprio lote. Retorna (aceitos, recusados); os recusados ganham a coluna
+    'motivo' e os aceitos a coluna 'nascimento' já convertida.
+    """
+    hoje = hoje or date.today()
+    motivo = pd.Series('', index=lote.index)
+
+    def recusar(mascara, texto):
+        motivo[mascara & (motivo == '')] = texto
+
+    for coluna in COLUNAS_OBRIGATORIAS:
+        recusar(lote[coluna] == '', f'Campo "{coluna}" vazio.')
+
+    recusar(~lote['nome'].str.len().between(3, 150), 'O nome deve ter entre 3 e 150 caracteres.')
+
+    cpf = chave_cpf(lote['cpf'])
+    recusar((cpf.str.len() != 11) | (lote['cpf'].str.len() > 14), 'CPF inválido.')
+
+    email = lote['email'].str.lower()
+    recusar(~lote['email'].str.fullmatch(r'[^@\s]+@[^@\s]+\.[^@\s]+') | (lote['email'].str.len() > 150),
+            'E-mail inválido.')
+
+    recusar(~lote['telefone'].str.len().between(10, 20), 'O telefone deve ter entre 10 e 20 caracteres.')
+
+    # Aceita o formato brasileiro (31/01/1990) e o ISO (1990-01-31), que é o das células de data do Excel
+    nascimento = pd.to_datetime(lote['data_nascimento'], format='%d/%m/%Y', errors='coerce').fillna(
+        pd.to_datetime(lote['data_nascimento'], format='%Y-%m-%d', errors='coerce')
+    )
+    recusar(nascimento.isna() | (nascimento > pd.Timestamp(hoje)) | (nascimento.dt.year < 1900),
+            'Data de nascimento inválida (use DD/MM/AAAA).')
+
+    tem_pin = lote['pin'] != ''
+    recusar(tem_pin & ~lote['pin'].str.fullmatch(r'\d{5}'), 'O PIN deve ter 5 números.')
+
+    recusar(cpf.isin(cpfs), 'CPF já cadastrado.')
+    recusar(email.isin(emails), 'E-mail já cadastrado.')
+    recusar(tem_pin & lote['pin'].isin(pins_usados), 'Este PIN já está em uso.')
+    # Repetidos dentro do arquivo: fica a primeira linha válida
+    validos = motivo == ''
+    recusar(cpf.where(validos).duplicated() & validos, 'CPF repetido no arquivo.')
+    validos = motivo == ''
+    recusar(email.where(validos).duplicated() & validos, 'E-mail repetido no arquivo.')
+    validos = motivo == ''
+    recusar(lote['pin'].where(validos & tem_pin).duplicated() & validos & tem_pin, 'PIN repetido no arquivo.')
+
+    aceitos = lote[motivo == ''].assign(nascimento=nascimento[motivo == ''].dt.date)
+    recusados = lote[motivo != ''].assign(motivo=motivo[motivo != ''])
+    return aceitos, recusados
+
+
+def _separar_pins(aceitos, pins_usados):
+    """
+    Tira da lista de PINs livres os PINs que vieram no arquivo e sorteia os
+    demais, tudo em lote. Retorna (aceitos com a coluna 'pin' preenchida,
+    recusados por falta de PIN).
+    """
+    tem_pin = aceitos['pin'] != ''
+    consumidos = pins.consumir_varios(aceitos.loc[tem_pin, 'pin'].tolist())
+    em_uso = tem_pin & ~aceitos['pin'].isin(consumidos)
+
+    sem_pin = aceitos.index[~tem_pin]
+    novos = []
+    while len(novos) < len(sem_pin):
+        alocados = pins.alocar(len(sem_pin) - len(novos))
+        if not alocados:
+            break
+        # Um PIN da lista que já tem dono (aluno gravado por fora do sistema) sai da lista e é descartado
+        novos += [pin for pin in alocados if pin not in pins_usados]
+    aceitos.loc[sem_pin[:len(novos)], 'pin'] = novos
+    esgotados = aceitos.index.isin(sem_pin[len(novos):])
+
+    recusados = pd.concat([
+        aceitos[em_uso].assign(motivo='Este PIN já está em uso.'),
+        aceitos[esgotados].assign(motivo='Não há mais PINs livres.'),
+    ])
+    return aceitos[~em_uso & ~esgotados], recusados
+
+
+def importar(arquivo, nome_arquivo, rejeitados, progresso=None):
+    """
+    Importa os alunos do arquivo em lotes de LINHAS_POR_LOTE: valida o lote,
+    separa os PINs, grava com um INSERT em lote e faz o commit, atualizando
+    os resumos diários e o índice do quiosque. As linhas recusadas vão para
+    'rejeitados' (arquivo texto aberto) como CSV, com o número da linha e o
+    motivo. 'progresso(lidas, importados, recusados)' é chamada após cada lote.
+    Retorna o dicionário com esses três totais.
+    """
+    pins.garantir_lista()
+    cpfs, emails, pins_usados = chaves_existentes()
+    relatorio = csv.writer(rejeitados, delimiter=';')
+    relatorio.writerow(['linha', 'motivo'] + COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS)
+    totais = {'lidas': 0, 'importados': 0, 'recusados': 0}
+
+    for lote in ler_lotes(arquivo, nome_arquivo):
+        aceitos, recusados = validar_lote(lote, cpfs, emails, pins_usados)
+        aceitos, sem_pin = _separar_pins(aceitos, pins_usados)
+        recusados = pd.concat([recusados, sem_pin]).sort_values('linha')
+
+        agora = datetime.utcnow()
+        ids = []
+        if len(aceitos):
+            # INSERT em lote não passa pelos @validates: nome_busca é preenchido aqui
+            ids = db.session.execute(insert(Membro).returning(Membro.id, sort_by_parameter_order=True), [{
+                'nome': linha.nome,
+                'nome_busca': normalizar_busca(linha.nome),
+                'cpf': linha.cpf,
+                'pin': linha.pin,
+                'data_nascimento': linha.nascimento,
+                'endereco': linha.endereco or None,
+                'telefone': linha.telefone,
+                'email': linha.email,
+                'data_cadastro': agora,
+                'status': 'Ativo',
+            } for linha in aceitos.itertuples(index=False)]).scalars().all()
+            resumos.registrar_cadastros([agora] * len(ids))
+        db.session.commit()
+        indice_elegibilidade.atualizar(*ids)
+
+        cpfs.update(chave_cpf(aceitos['cpf']))
+        emails.update(aceitos['email'].str.lower())
+        pins_usados.update(aceitos['pin'])
+        relatorio.writerows(recusados[['linha', 'motivo'] + COLUNAS_OBRIGATORIAS + COLUNAS_OPCIONAIS].itertuples(index=False))
+
+        totais['lidas'] += len(lote)
+        totais['importados'] += len(ids)
+        totais['recusados'] += len(recusados)
+        if progresso:
+            progresso(totais['lidas'], totais['importados'], totais['recusados'])
+    return totais
@@ -0,0 +1,76 @@
+# fitpro_academia/app/lembretes.py
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import case, exists, insert
+from sqlalchemy.orm import aliased
+
+from . import db, emails
+from .models import LembreteEnviado, Matricula, Membro, Plano
+
+# Quantos lembretes são gravados na fila por commit
+LOTE_GRAVACAO = 1000
+
+
+def consulta_pendentes(hoje, dias=7, dias_vencidas=30):
+    """
+    Uma única consulta com as matrículas que precisam de lembrete: ativas,
+    vencendo nos próximos 'dias' ou vencidas há até 'dias_vencidas', de alunos
+    ativos com e-mail, que ainda não foram renovadas e que ainda não receberam
+    o lembrete do mesmo tipo para a mesma data de fim.
+    """
+    tipo = case((Matricula.data_fim < hoje, 'Vencida'), else_='Vencendo')
+    renovacao = aliased(Matricula)
+
+    return db.session.query(
+        Matricula.id, Matricula.data_fim, tipo.label('tipo'), Membro.nome, Membro.email, Plano.nome.label('plano')
+    ).join(Membro, Matricula.membro_id == Membro.id).join(Plano, Matricula.plano_id == Plano.id).filter(
+        Matricula.status == 'Ativa',
+        Matricula.data_fim.between(hoje - timedelta(days=dias_vencidas), hoje + timedelta(days=dias)),
+        Membro.status == 'Ativo',
+        Membro.email.isnot(None),
+        # O aluno já renovou: existe outra matrícula ativa que termina depois desta
+        ~exists().where(
+            renovacao.membro_id == Matricula.membro_id,
+            renovacao.status == 'Ativa',
+            renovacao.data_fim > Matricula.data_fim
+        ),
+        ~exists().where(
+            LembreteEnviado.matricula_id == Matricula.id,
+            LembreteEnviado.tipo == tipo,
+            LembreteEnviado.data_fim == Matricula.data_fim
+        )
+    ).order_by(Matricula.data_fim, Matricula.id)
+
+
+def enfileirar_lembretes(hoje=None, dias=7, dias_vencidas=30):
+    """
+    Coloca na fila de e-mails os lembretes de vencimento e registra cada um em
+    LembreteEnviado, em lotes de LOTE_GRAVACAO com um commit por lote. O modelo
+    do e-mail é compilado uma vez só e reaproveitado. Retorna quantos foram
+    para a fila.
+    """
+    if hoje is None:
+        hoje = (datetime.utcnow() - timedelta(hours=3)).date()
+    modelo = current_app.jinja_env.get_template('email/lembrete_vencimento.html')
+
+    linhas = consulta_pendentes(hoje, dias, dias_vencidas).all()
+    for inicio in range(0, len(linhas), LOTE_GRAVACAO):
+        lote = linhas[inicio:inicio + LOTE_GRAVACAO]
+        fila = []
+        for linha in lote:
+            vencida = linha.tipo == 'Vencida'
+            fila.append(emails.enfileirar(
+                linha.email,
+                'Sua matrícula GymFlow venceu' if vencida else 'Sua matrícula GymFlow está vencendo',
+                html=modelo.render(nome=linha.nome, plano=linha.plano, data_fim=linha.data_fim, vencida=vencida)
+            ))
+        # O flush grava os e-mails de uma vez e traz os ids para o registro dos lembretes
+        db.session.flush()
+        db.session.execute(insert(LembreteEnviado), [
+            {'matricula_id': linha.id, 'tipo': linha.tipo, 'data_fim': linha.data_fim, 'email_id': email.id}
+            for linha, email in zip(lote, fila)
+        ])
+        db.session.commit()
+    return len(linhas)
@@ -0,0 +1,110 @@
+# fitpro_academia/app/manutencao.py
+
+import time
+from collections import defaultdict
+
+from sqlalchemy import delete, exists, func, select, tuple_
+
+from . import db, resumos
+from .models import (Anamnese, Frequencia, LembreteEnviado, Matricula, Membro, Pagamento, Plano,
+                     ResumoMembro, Treino, frequencia_arquivo, treinos_membros)
+
+# Linhas apagadas por DELETE (e por commit), para não segurar travas por muito tempo
+LOTE_LIMPEZA = 5000
+
+# (descrição, coluna da tabela filha, chave da tabela pai). A ordem importa: as
+# matrículas órfãs saem antes, e os pagamentos delas viram órfãos logo em seguida.
+VERIFICACOES = [
+    ('matricula sem aluno', Matricula.membro_id, Membro.id),
+    ('matricula sem plano', Matricula.plano_id, Plano.id),
+    ('pagamento sem matricula', Pagamento.matricula_id, Matricula.id),
+    ('lembrete_enviado sem matricula', LembreteEnviado.matricula_id, Matricula.id),
+    ('frequencia sem aluno', Frequencia.membro_id, Membro.id),
+    ('frequencia_arquivo sem aluno', frequencia_arquivo.c.membro_id, Membro.id),
+    ('anamnese sem aluno', Anamnese.membro_id, Membro.id),
+    ('resumo_membro sem aluno', ResumoMembro.membro_id, Membro.id),
+    ('treinos_membros sem aluno', treinos_membros.c.membro_id, Membro.id),
+    ('treinos_membros sem treino', treinos_membros.c.treino_id, Treino.id),
+]
+
+
+def _sem_pai(coluna, chave_pai):
+    """Condição anti-join: não existe linha na tabela pai para a chave da filha."""
+    return ~exists().where(chave_pai == coluna)
+
+
+def contar_orfaos(coluna, chave_pai):
+    return db.session.execute(
+        select(func.count()).select_from(coluna.table).where(_sem_pai(coluna, chave_pai))
+    ).scalar()
+
+
+def _recalcular_dias(dias):
+    """Refaz os resumos diários dos dias informados, um intervalo por mês."""
+    por_mes = defaultdict(list)
+    for dia in dias:
+        por_mes[dia.replace(day=1)].append(dia)
+    for dias_do_mes in por_mes.values():
+        resumos.recalcular(min(dias_do_mes), max(dias_do_mes))
+
+
+def apagar_orfaos(coluna, chave_pai, lote=LOTE_LIMPEZA):
+    """
+    Apaga as linhas órfãs em DELETEs de até 'lote' linhas, com um commit por
+    DELETE. As linhas de cada lote são escolhidas pela chave primária (ou pela
+    tupla da chave composta, no caso de treinos_membros). Pagamentos e
+    frequências apagados também saem dos resumos diários. Retorna o total.
+    """
+    tabela = coluna.table
+    chave = list(tabela.primary_key.columns)
+    alvo = chave[0] if len(chave) == 1 else tuple_(*chave)
+    total = 0
+    while True:
+        escolhidas = select(*chave).where(_sem_pai(coluna, chave_pai)).limit(lote)
+        if len(chave) == 1:
+            escolhidas = escolhidas.scalar_subquery()
+        comando = delete(tabela).where(alvo.in_(escolhidas))
+        if tabela is Pagamento.__table__:
+            # A receita dos resumos diários sai junto, na mesma transação
+            removidos = db.session.execute(
+                comando.returning(Pagamento.data_pagamento, Pagamento.valor, Pagamento.status)
+            ).all()
+            resumos.descontar_pagamentos(removidos)
+            apagadas = len(removidos)
+            dias = ()
+        elif tabela in (Frequencia.__table__, frequencia_arquivo):
+            # Check-ins e presentes não dá para descontar: os dias afetados são refeitos
+            removidos = db.session.execute(comando.returning(tabela.c.data_hora)).all()
+            apagadas = len(removidos)
+            dias = {resumos.dia_local(data_hora) for (data_hora,) in removidos}
+        else:
+            apagadas = db.session.execute(comando).rowcount
+            dias = ()
+        db.session.commit()
+        if dias:
+            _recalcular_dias(dias)
+        total += apagadas
+        if apagadas < lote:
+            return total
+
+
+def limpar_orfaos(simular=False, lote=LOTE_LIMPEZA, apenas=None, relatorio=None):
+    """
+    Percorre VERIFICACOES (ou só as da tabela 'apenas') contando ou apagando as
+    linhas órfãs. 'relatorio(descricao, quantidade, segundos)' é chamada após
+    cada verificação. Retorna o total de linhas órfãs. Na simulação, os
+    pagamentos de matrículas que ainda serão apagadas não entram na conta.
+    """
+    total = 0
+    for descricao, coluna, chave_pai in VERIFICACOES:
+        if apenas and coluna.table.name != apenas:
+            continue
+        inicio = time.perf_counter()
+        if simular:
+            quantidade = contar_orfaos(coluna, chave_pai)
+        else:
+            quantidade = apagar_orfaos(coluna, chave_pai, lote)
+        if relatorio:
+            relatorio(descricao, quantidade, time.perf_counter() - inicio)
+        total += quantidade
+    return total
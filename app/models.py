@@ -3,8 +3,42 @@
 from . import db
 from datetime import date, datetime
 from flask_login import UserMixin
+from sqlalchemy import Integer, String, and_, case, cast, literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
+from sqlalchemy.sql.functions import FunctionElement
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
+import unicodedata
+
+
+def normalizar_busca(texto):
+    """Texto em minúsculas, sem acentos e com espaços simples (usado nas colunas de busca)."""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ' '.join(sem_acentos.lower().split())
+
+
+class diferenca_dias(FunctionElement):
+    """Expressão SQL com o número de dias entre duas datas (fim - inicio)."""
+    type = Integer()
+    name = 'diferenca_dias'
+    inherit_cache = True
+
+
+@compiles(diferenca_dias)
+def _diferenca_dias(elemento, compilador, **kw):
+    # PostgreSQL: date - date já é um número inteiro de dias
+    fim, inicio = elemento.clauses
+    return f'({compilador.process(fim, **kw)} - {compilador.process(inicio, **kw)})'
+
+
+@compiles(diferenca_dias, 'sqlite')
+def _diferenca_dias_sqlite(elemento, compilador, **kw):
+    fim, inicio = elemento.clauses
+    return f'CAST(julianday({compilador.process(fim, **kw)}) - julianday({compilador.process(inicio, **kw)}) AS INTEGER)'
+
 
 # Tabela de associação para a relação Muitos-para-Muitos entre Membro e Treino
 treinos_membros = db.Table('treinos_membros',
@@ -23,13 +57,27 @@ class Membro(db.Model):
     email = db.Column(db.String(150), unique=True, nullable=False)
     data_cadastro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     status = db.Column(db.String(20), nullable=False, default='Ativo') # Valores: 'Ativo', 'Inativo'
-
+    nome_busca = db.Column(db.String(150), nullable=False, default='') # Nome normalizado, preenchido automaticamente
 
     # Relacionamentos
     anamneses = db.relationship('Anamnese', backref='membro', lazy=True, cascade="all, delete-orphan")
     matriculas = db.relationship('Matricula', back_populates='membro', lazy=True, cascade="all, delete-orphan")
     frequencias = db.relationship('Frequencia', back_populates='membro', lazy=True, cascade="all, delete-orphan")
     treinos = db.relationship('Treino', secondary=treinos_membros, back_populates='membros', lazy='dynamic')
+    resumo = db.relationship('ResumoMembro', uselist=False, lazy=True, cascade="all, delete-orphan")
+
+    # Índices para as listagens filtradas por status e ordenadas por nome
+    __table_args__ = (
+        db.Index('ix_membro_status_nome', 'status', 'nome'),
+        # Seletores com autocompletar: só alunos ativos, por começo do nome
+        db.Index('ix_membro_status_nome_busca', 'status', 'nome_busca',
+                 postgresql_ops={'nome_busca': 'text_pattern_ops'}),
+    )
+
+    @validates('nome')
+    def _atualizar_nome_busca(self, chave, nome):
+        self.nome_busca = normalizar_busca(nome)
+        return nome
 
     def __repr__(self):
         return f"<Membro '{self.nome}'>"
@@ -63,7 +111,14 @@ class Matricula(db.Model):
     plano = db.relationship('Plano', back_populates='matriculas')
     pagamentos = db.relationship('Pagamento', back_populates='matricula', lazy=True, cascade="all, delete-orphan")
 
-    @property
+    # Índices para a validação do check-in e para as listas de vencimento
+    __table_args__ = (
+        db.Index('ix_matricula_membro_id_status_data_fim', 'membro_id', 'status', 'data_fim'),
+        db.Index('ix_matricula_ativa_data_fim', 'data_fim',
+                 sqlite_where=db.text("status = 'Ativa'"), postgresql_where=db.text("status = 'Ativa'")),
+    )
+
+    @hybrid_property
     def status_dinamico(self):
         hoje = date.today()
         
@@ -84,6 +139,30 @@ class Matricula(db.Model):
         
         return "Ativa"
 
+    @status_dinamico.expression
+    def status_dinamico(cls):
+        # Mesma regra da propriedade acima, num CASE: serve para filtrar, ordenar e contar no banco
+        hoje = date.today()
+        dias_restantes = diferenca_dias(cls.data_fim, hoje)
+        return case(
+            (cls.status != 'Ativa', cls.status),
+            (cls.data_fim < hoje, 'Vencida'),
+            (dias_restantes == 0, 'Vence hoje'),
+            (dias_restantes == 1, 'Vence amanhã'),
+            (dias_restantes <= 7, literal('Vence em ') + cast(dias_restantes, String) + ' dias'),
+            else_='Ativa'
+        )
+
+    @hybrid_property
+    def vigente(self):
+        """True se o status_dinamico é 'Ativa' ou 'Vence ...' (ativa e ainda não vencida)."""
+        return self.status == 'Ativa' and self.data_fim >= date.today()
+
+    @vigente.expression
+    def vigente(cls):
+        # Comparação direta com data_fim, para usar os índices de matrícula
+        return and_(cls.status == 'Ativa', cls.data_fim >= date.today())
+
     def __repr__(self):
         return f"<Matricula id={self.id} do Membro id={self.membro_id}>"
 
@@ -101,6 +180,14 @@ class Pagamento(db.Model):
     # Relacionamento
     matricula = db.relationship('Matricula', back_populates='pagamentos')
 
+    # Índices para o dashboard, o financeiro e os relatórios
+    __table_args__ = (
+        db.Index('ix_pagamento_status_data_pagamento', 'status', 'data_pagamento'),
+        db.Index('ix_pagamento_nao_arquivado_data_pagamento', 'data_pagamento',
+                 sqlite_where=db.text("status <> 'Arquivado'"), postgresql_where=db.text("status <> 'Arquivado'")),
+        db.Index('ix_pagamento_matricula_id', 'matricula_id'),
+    )
+
     def __repr__(self):
         return f"<Pagamento de R${self.valor} para Matrícula id={self.matricula_id}>"
 
@@ -111,10 +198,17 @@ class Instrutor(db.Model):
     telefone = db.Column(db.String(20))
     email = db.Column(db.String(150), unique=True, nullable=False)
     especialidade = db.Column(db.String(100))
+    busca = db.Column(db.String(260), nullable=False, default='') # Nome + especialidade normalizados
 
     # Relacionamento
     treinos_criados = db.relationship('Treino', back_populates='instrutor', lazy=True)
 
+    @validates('nome', 'especialidade')
+    def _atualizar_busca(self, chave, valor):
+        campos = {'nome': self.nome, 'especialidade': self.especialidade, chave: valor}
+        self.busca = normalizar_busca(f"{campos['nome'] or ''} {campos['especialidade'] or ''}")
+        return valor
+
     def __repr__(self):
         return f"<Instrutor '{self.nome}'>"
 
@@ -148,9 +242,29 @@ class Frequencia(db.Model):
     # Relacionamento
     membro = db.relationship('Membro', back_populates='frequencias')
 
+    # Índices para as consultas por dia (dashboard, frequência) e por aluno
+    __table_args__ = (
+        db.Index('ix_frequencia_data_hora_tipo_status', 'data_hora', 'tipo', 'status'),
+        db.Index('ix_frequencia_membro_id_data_hora', 'membro_id', 'data_hora'),
+    )
+
     def __repr__(self):
         return f"<Frequencia de {self.tipo} do Membro id={self.membro_id}>"
 
+# Check-ins antigos, movidos da tabela frequencia por 'flask arquivar-frequencias'.
+# No PostgreSQL é particionada por mês de data_hora (as partições são criadas pelo
+# arquivamento); no SQLite é uma tabela comum. Por isso data_hora faz parte da chave.
+frequencia_arquivo = db.Table('frequencia_arquivo',
+    db.Column('id', db.Integer, primary_key=True, autoincrement=False),
+    db.Column('data_hora', db.DateTime, primary_key=True),
+    db.Column('tipo', db.String(10), nullable=False),
+    db.Column('status', db.String(50), nullable=False),
+    db.Column('membro_id', db.Integer, nullable=False),
+    db.Index('ix_frequencia_arquivo_data_hora', 'data_hora'),
+    db.Index('ix_frequencia_arquivo_membro_id_data_hora', 'membro_id', 'data_hora'),
+    postgresql_partition_by='RANGE (data_hora)'
+)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True, nullable=False)
@@ -189,9 +303,129 @@ class Anamnese(db.Model):
     # Campos de controle e segurança
     data_preenchimento = db.Column(db.DateTime)
     token = db.Column(db.String(32), unique=True, nullable=False, default=lambda: secrets.token_hex(16))
+    # Quando o convite foi enviado: o link expira após ANAMNESE_VALIDADE_DIAS sem resposta
+    data_envio = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     # Chave estrangeira para o aluno
     membro_id = db.Column(db.Integer, db.ForeignKey('membro.id'), nullable=False)
 
     def __repr__(self):
-        return f'<Anamnese do Membro ID {self.membro_id}>'
\ No newline at end of file
+        return f'<Anamnese do Membro ID {self.membro_id}>'
+
+
+class ResumoDiario(db.Model):
+    """Totais de cada dia (horário local, UTC-3), usados pelos relatórios de planilhas."""
+    dia = db.Column(db.Date, primary_key=True)
+    checkins = db.Column(db.Integer, nullable=False, default=0) # Registros de 'Entrada' no dia
+    # Mapa de bits dos membro_id que tiveram alguma frequência no dia.
+    # Permite contar alunos únicos de um período inteiro com um OR entre os dias.
+    presentes = db.Column(db.LargeBinary, nullable=False, default=b'')
+    novos_cadastros = db.Column(db.Integer, nullable=False, default=0)
+    receita = db.Column(db.Numeric(12, 2), nullable=False, default=0) # Pagamentos 'Confirmado' ou 'Arquivado'
+
+    def __repr__(self):
+        return f'<ResumoDiario {self.dia}>'
+
+
+class RetencaoCoorte(db.Model):
+    """
+    Foto de um mês já fechado do relatório de coortes (ver app/coortes.py):
+    os alunos cadastrados num mês e quantos deles continuavam matriculados e
+    frequentando num mês posterior. Gravada uma vez e nunca alterada.
+    """
+    coorte = db.Column(db.Date, primary_key=True) # Mês de cadastro (dia 1, horário local)
+    mes = db.Column(db.Date, primary_key=True) # Mês medido (dia 1)
+    cadastrados = db.Column(db.Integer, nullable=False)
+    matriculados = db.Column(db.Integer, nullable=False) # Com matrícula não cancelada cobrindo algum dia do mês
+    ativos = db.Column(db.Integer, nullable=False) # Com ao menos uma entrada liberada no mês
+    perdidos = db.Column(db.Integer, nullable=False) # Matriculados no mês anterior e não neste
+    data_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RetencaoCoorte {self.coorte} em {self.mes}>'
+
+
+class ResumoMembro(db.Model):
+    """Contadores de visitas (entradas liberadas) de cada aluno, usados na página de detalhes."""
+    membro_id = db.Column(db.Integer, db.ForeignKey('membro.id', ondelete='CASCADE'), primary_key=True)
+    total_visitas = db.Column(db.Integer, nullable=False, default=0)
+    ultima_visita = db.Column(db.DateTime) # Em UTC, como Frequencia.data_hora
+    mes_referencia = db.Column(db.Date) # Primeiro dia (horário local) do mês contado em visitas_mes
+    visitas_mes = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ResumoMembro do Membro ID {self.membro_id}>'
+
+
+class PinLivre(db.Model):
+    """PINs de acesso (00000-99999) que nenhum aluno usa ainda. Mantida por pins.py."""
+    pin = db.Column(db.String(5), primary_key=True)
+    ordem = db.Column(db.Integer, nullable=False, index=True) # Posição sorteada: a ordem em que os PINs são oferecidos
+    reservado_ate = db.Column(db.DateTime) # Sugerido numa tela de cadastro; volta a ficar livre depois disso
+
+    def __repr__(self):
+        return f'<PinLivre {self.pin}>'
+
+
+class EmailPendente(db.Model):
+    """Fila de e-mails de saída. As rotas só gravam aqui; 'flask enviar-emails' faz o envio."""
+    id = db.Column(db.Integer, primary_key=True)
+    destinatario = db.Column(db.String(150), nullable=False)
+    assunto = db.Column(db.String(200), nullable=False)
+    corpo_texto = db.Column(db.Text)
+    corpo_html = db.Column(db.Text)
+    # Um anexo opcional (ex.: a imagem do QR Code)
+    anexo_nome = db.Column(db.String(100))
+    anexo_tipo = db.Column(db.String(50))
+    anexo_dados = db.Column(db.LargeBinary)
+
+    status = db.Column(db.String(20), nullable=False, default='Pendente') # Valores: 'Pendente', 'Enviado', 'Falhou'
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    proxima_tentativa = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    ultimo_erro = db.Column(db.Text)
+    data_criacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    data_envio = db.Column(db.DateTime)
+
+    # Índice para o worker buscar os próximos e-mails a enviar
+    __table_args__ = (
+        db.Index('ix_email_pendente_status_proxima_tentativa', 'status', 'proxima_tentativa'),
+    )
+
+    def __repr__(self):
+        return f'<EmailPendente {self.id} para {self.destinatario} ({self.status})>'
+
+
+class LembreteEnviado(db.Model):
+    """
+    Registro dos lembretes de vencimento já colocados na fila, para que cada
+    matrícula receba um só aviso de 'Vencendo' e um de 'Vencida' por data de fim.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    matricula_id = db.Column(db.Integer, db.ForeignKey('matricula.id', ondelete='CASCADE'), nullable=False)
+    tipo = db.Column(db.String(20), nullable=False) # Valores: 'Vencendo', 'Vencida'
+    # A data de fim avisada: se a matrícula for prorrogada, um novo lembrete pode sair
+    data_fim = db.Column(db.Date, nullable=False)
+    email_id = db.Column(db.Integer, db.ForeignKey('email_pendente.id', ondelete='SET NULL'))
+    data_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('matricula_id', 'tipo', 'data_fim', name='uq_lembrete_enviado_matricula_tipo_data_fim'),
+    )
+
+    def __repr__(self):
+        return f'<LembreteEnviado {self.tipo} da Matrícula {self.matricula_id}>'
+
+
+class AlteracaoElegibilidade(db.Model):
+    """
+    Registro de cada aluno cuja liberação no quiosque mudou (matrícula,
+    pagamento, PIN...). Cada worker guarda o último id que já aplicou ao seu
+    índice em memória e, a cada leitura, relê só os alunos das linhas novas.
+    Sem chave estrangeira: alunos excluídos também precisam ser avisados.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    membro_id = db.Column(db.Integer, nullable=False)
+    data_registro = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AlteracaoElegibilidade {self.id} do Membro {self.membro_id}>'
@@ -0,0 +1,129 @@
+# fitpro_academia/app/ocupacao.py
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import db
+from .models import Frequencia
+
+
+class ContadorOcupacao:
+    """
+    Quantas pessoas estão na academia agora, mantido em memória (por
+    processo) a partir das entradas e saídas liberadas: membro_id -> horário
+    da entrada, na ordem das entradas. Uma entrada sem saída há mais de
+    OCUPACAO_PERMANENCIA_HORAS é dada como encerrada (quem esqueceu de
+    registrar a saída), e a virada do dia local zera o contador.
+
+    É montado na inicialização com os registros de hoje e, como cada worker
+    tem o seu próprio contador, uma thread o recarrega do banco a cada
+    OCUPACAO_TTL segundos (0 desliga). Quem consulta nunca espera o banco.
+    """
+
+    def __init__(self):
+        self._presentes = OrderedDict()
+        self._lock = threading.Lock()
+        self._dia = None
+        self._thread = None
+        self.permanencia = timedelta(hours=4)
+        self.ttl = 60
+
+    def init_app(self, app):
+        self.permanencia = timedelta(hours=app.config.get('OCUPACAO_PERMANENCIA_HORAS', 4))
+        self.ttl = app.config.get('OCUPACAO_TTL', 60)
+        with app.app_context():
+            try:
+                self.carregar()
+            except SQLAlchemyError:
+                # O banco ainda não existe (ex.: antes do 'flask db upgrade')
+                db.session.rollback()
+        if self.ttl and self._thread is None:
+            self._thread = threading.Thread(target=self._executar, args=(app,), name='contador-ocupacao', daemon=True)
+            self._thread.start()
+
+    def _executar(self, app):
+        while True:
+            time.sleep(self.ttl)
+            with app.app_context():
+                try:
+                    self.carregar()
+                except SQLAlchemyError:
+                    db.session.rollback()
+                    app.logger.exception('Falha ao recarregar o contador de ocupação; nova tentativa em seguida.')
+
+    @staticmethod
+    def _inicio_do_dia(agora):
+        """Início (em UTC) do dia local de 'agora'."""
+        hoje_local = agora - timedelta(hours=3)
+        return hoje_local.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(hours=3)
+
+    def carregar(self):
+        """Remonta o contador com a última entrada e a última saída de cada aluno hoje."""
+        agora = datetime.utcnow()
+        desde = max(self._inicio_do_dia(agora), agora - self.permanencia)
+        ultimos = {}
+        for membro_id, tipo, data_hora in db.session.query(
+            Frequencia.membro_id, Frequencia.tipo, func.max(Frequencia.data_hora)
+        ).filter(
+            Frequencia.data_hora >= desde, Frequencia.status == 'Liberado'
+        ).group_by(Frequencia.membro_id, Frequencia.tipo):
+            ultimos.setdefault(membro_id, {})[tipo] = data_hora
+
+        entradas = sorted(
+            (registros['Entrada'], membro_id) for membro_id, registros in ultimos.items()
+            if 'Entrada' in registros and registros['Entrada'] > registros.get('Saída', datetime.min)
+        )
+        with self._lock:
+            self._presentes = OrderedDict((membro_id, entrada) for entrada, membro_id in entradas)
+            self._dia = (agora - timedelta(hours=3)).date()
+
+    def registrar(self, linhas):
+        """Aplica as linhas de frequência gravadas (dicts com membro_id, tipo, status e data_hora)."""
+        agora = datetime.utcnow()
+        # Leituras sincronizadas com atraso que já teriam sido encerradas não contam
+        desde = max(self._inicio_do_dia(agora), agora - self.permanencia)
+        fora_de_ordem = False
+        with self._lock:
+            for linha in sorted(linhas, key=lambda linha: linha['data_hora']):
+                if linha['status'] != 'Liberado' or linha['data_hora'] < desde:
+                    continue
+                membro_id = linha['membro_id']
+                if linha['tipo'] == 'Saída':
+                    entrada = self._presentes.get(membro_id)
+                    if entrada is not None and entrada <= linha['data_hora']:
+                        del self._presentes[membro_id]
+                elif linha['data_hora'] >= self._presentes.get(membro_id, datetime.min):
+                    ultima = next(reversed(self._presentes.values()), None)
+                    if ultima is not None and linha['data_hora'] < ultima:
+                        fora_de_ordem = True
+                    self._presentes[membro_id] = linha['data_hora']
+                    self._presentes.move_to_end(membro_id)
+            if fora_de_ordem:
+                # Leituras sincronizadas com atraso: reordena pelo horário da entrada,
+                # que é a ordem que _expirar espera
+                self._presentes = OrderedDict(sorted(self._presentes.items(), key=lambda item: item[1]))
+
+    def _expirar(self, agora):
+        """Encerra as permanências vencidas e zera o contador na virada do dia."""
+        if self._dia != (agora - timedelta(hours=3)).date():
+            self._presentes.clear()
+            self._dia = (agora - timedelta(hours=3)).date()
+            return
+        limite = agora - self.permanencia
+        # As entradas estão em ordem: basta olhar o começo
+        while self._presentes and next(iter(self._presentes.values())) < limite:
+            self._presentes.popitem(last=False)
+
+    def quantidade(self):
+        """Pessoas na academia agora, sem consultar o banco."""
+        with self._lock:
+            self._expirar(datetime.utcnow())
+            return len(self._presentes)
+
+
+contador_ocupacao = ContadorOcupacao()
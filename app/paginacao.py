@@ -0,0 +1,120 @@
+# fitpro_academia/app/paginacao.py
+
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import func, select, tuple_
+
+from . import db
+
+
+class PaginaKeyset:
+    """
+    Uma página de resultados paginada por chave (seek). Em vez de OFFSET, cada
+    página começa logo depois (ou antes) da última linha vista, então a página
+    N custa o mesmo que a primeira. Os cursores são tokens assinados e opacos.
+    """
+
+    def __init__(self, items, cursor_proximo=None, cursor_anterior=None, total=None, total_exato=True):
+        self.items = items
+        self.cursor_proximo = cursor_proximo
+        self.cursor_anterior = cursor_anterior
+        self.total = total
+        self.total_exato = total_exato
+
+    @property
+    def has_next(self):
+        return self.cursor_proximo is not None
+
+    @property
+    def has_prev(self):
+        return self.cursor_anterior is not None
+
+
+def _serializador():
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='paginacao-keyset')
+
+
+def _gerar_cursor(valor, id_, direcao):
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    return _serializador().dumps([valor, id_, direcao])
+
+
+def _ler_cursor(cursor, coluna):
+    """Retorna (valor, id, direção) ou None se o cursor for inválido."""
+    try:
+        valor, id_, direcao = _serializador().loads(cursor)
+        if coluna.type.python_type is datetime:
+            valor = datetime.fromisoformat(valor)
+        return valor, int(id_), direcao
+    except (BadSignature, TypeError, ValueError):
+        return None
+
+
+def consulta_contagem(query, limite):
+    """O SELECT count(*) usado por contar_ate(), limitado a 'limite' + 1 linhas."""
+    subconsulta = query.enable_eagerloads(False).order_by(None).limit(limite + 1).subquery()
+    return select(func.count()).select_from(subconsulta)
+
+
+def contar_ate(query, limite):
+    """
+    Conta as linhas da consulta, mas para de contar em 'limite' + 1. Retorna
+    (total, exato). O custo fica limitado mesmo em tabelas muito grandes.
+    """
+    total = db.session.execute(consulta_contagem(query, limite)).scalar()
+    return min(total, limite), total <= limite
+
+
+def consulta_pagina(query, coluna, coluna_id, por_pagina, posicao=None, decrescente=True):
+    """
+    A consulta de uma página: as linhas depois de 'posicao' ((valor, id) da
+    última linha vista, ou None na primeira página) na ordem (coluna,
+    coluna_id), com uma linha a mais para saber se existe a próxima página.
+    """
+    chave = tuple_(coluna, coluna_id)
+    if posicao is not None:
+        valor_cursor = tuple_(*posicao)
+        query = query.filter(chave < valor_cursor if decrescente else chave > valor_cursor)
+    if decrescente:
+        query = query.order_by(coluna.desc(), coluna_id.desc())
+    else:
+        query = query.order_by(coluna.asc(), coluna_id.asc())
+    return query.limit(por_pagina + 1)
+
+
+def paginar_keyset(query, coluna, coluna_id, por_pagina, cursor=None, descendente=True, limite_contagem=None):
+    """
+    Pagina 'query' ordenando por (coluna, coluna_id). 'cursor' é o token
+    recebido de uma página anterior. Se 'limite_contagem' for informado,
+    calcula também o total (aproximado acima desse limite).
+    """
+    total, total_exato = (None, True)
+    if limite_contagem:
+        total, total_exato = contar_ate(query, limite_contagem)
+
+    posicao = _ler_cursor(cursor, coluna) if cursor else None
+    voltando = posicao is not None and posicao[2] == 'antes'
+
+    # Voltando uma página, a ordem é invertida e o resultado é desvirado depois
+    decrescente = descendente != voltando
+    items = consulta_pagina(query, coluna, coluna_id, por_pagina,
+                            posicao[:2] if posicao is not None else None, decrescente).all()
+    tem_mais = len(items) > por_pagina
+    items = items[:por_pagina]
+    if voltando:
+        items.reverse()
+
+    def _cursor_do(item, direcao):
+        return _gerar_cursor(getattr(item, coluna.key), getattr(item, coluna_id.key), direcao)
+
+    cursor_proximo = cursor_anterior = None
+    if items:
+        if tem_mais or voltando:
+            cursor_proximo = _cursor_do(items[-1], 'depois')
+        if (posicao is not None and not voltando) or (voltando and tem_mais):
+            cursor_anterior = _cursor_do(items[0], 'antes')
+
+    return PaginaKeyset(items, cursor_proximo, cursor_anterior, total, total_exato)
@@ -0,0 +1,98 @@
+# fitpro_academia/app/painel.py
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from . import db
+from .models import Aviso, Frequencia, Matricula, Pagamento
+
+
+def consulta_cards(hoje_local):
+    """
+    O SELECT único com todos os cards do dashboard (uma subconsulta escalar
+    por card). 'hoje_local' é a data de hoje no fuso UTC-3.
+    """
+    inicio_dia_utc = datetime.combine(hoje_local, datetime.min.time()) + timedelta(hours=3)
+    fim_dia_utc = datetime.combine(hoje_local, datetime.max.time()) + timedelta(hours=3)
+    proximos_7_dias = hoje_local + timedelta(days=7)
+    aviso_recente = select(Aviso).order_by(Aviso.data_criacao.desc()).limit(1).subquery()
+
+    consulta = select(
+        select(func.count(Frequencia.id)).where(
+            Frequencia.tipo == 'Entrada',
+            Frequencia.data_hora.between(inicio_dia_utc, fim_dia_utc)
+        ).scalar_subquery().label('total_checkins_hoje'),
+        select(func.sum(Pagamento.valor)).where(
+            Pagamento.status == 'Confirmado',
+            Pagamento.data_pagamento.between(inicio_dia_utc, fim_dia_utc)
+        ).scalar_subquery().label('receita_hoje'),
+        select(func.count(Matricula.id)).where(
+            Matricula.status == 'Ativa',
+            Matricula.data_fim.between(hoje_local, proximos_7_dias)
+        ).scalar_subquery().label('vencendo_em_breve'),
+        select(func.count(Pagamento.id)).where(
+            Pagamento.status == 'Pendente'
+        ).scalar_subquery().label('pagamentos_pendentes'),
+        select(aviso_recente.c.conteudo).scalar_subquery().label('aviso_conteudo'),
+    )
+    return consulta
+
+
+def calcular_cards(hoje_local):
+    """Calcula todos os cards do dashboard (ver consulta_cards)."""
+    linha = db.session.execute(consulta_cards(hoje_local)).one()
+
+    return {
+        'total_checkins_hoje': linha.total_checkins_hoje,
+        'receita_hoje': linha.receita_hoje or 0.0,
+        'vencendo_em_breve': linha.vencendo_em_breve,
+        'pagamentos_pendentes': linha.pagamentos_pendentes,
+        'aviso_ativo': {'conteudo': linha.aviso_conteudo} if linha.aviso_conteudo is not None else None,
+    }
+
+
+class CachePainel:
+    """
+    Guarda os cards do dashboard por PAINEL_CACHE_TTL segundos, com a chave
+    sendo o dia local. As rotas que alteram algum card chamam invalidar().
+    O cache é por processo; o TTL curto limita a defasagem entre workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dia = None
+        self._cards = None
+        self._expira_em = 0
+        self._versao = 0
+        self.ttl = 30
+
+    def init_app(self, app):
+        self.ttl = app.config.get('PAINEL_CACHE_TTL', 30)
+
+    def invalidar(self):
+        with self._lock:
+            self._versao += 1
+            self._cards = None
+
+    def obter(self):
+        hoje_local = (datetime.utcnow() - timedelta(hours=3)).date()
+        with self._lock:
+            if self._cards is not None and self._dia == hoje_local and time.monotonic() < self._expira_em:
+                return self._cards
+            versao = self._versao
+
+        cards = calcular_cards(hoje_local)
+
+        with self._lock:
+            # Se alguma escrita invalidou o cache durante o cálculo, não guarda o resultado
+            if versao == self._versao:
+                self._dia = hoje_local
+                self._cards = cards
+                self._expira_em = time.monotonic() + self.ttl
+        return cards
+
+
+cache_painel = CachePainel()
@@ -0,0 +1,107 @@
+# fitpro_academia/app/pins.py
+
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, or_, select, update
+
+from . import db
+from .models import Membro, PinLivre
+
+TOTAL_PINS = 100000
+
+# Por quanto tempo um PIN sugerido na tela de cadastro fica separado
+RESERVA_MINUTOS = 15
+
+
+def preencher():
+    """
+    Monta a lista de PINs livres (todos os PINs menos os já usados), numa
+    ordem sorteada. Só precisa rodar uma vez: depois a lista é mantida a
+    cada cadastro, sem consultar a tabela membro.
+    """
+    usados = {pin for (pin,) in db.session.query(Membro.pin)}
+    livres = [f'{numero:05d}' for numero in range(TOTAL_PINS) if f'{numero:05d}' not in usados]
+    random.shuffle(livres)
+
+    db.session.execute(delete(PinLivre))
+    for inicio in range(0, len(livres), 5000):
+        db.session.execute(insert(PinLivre), [
+            {'pin': pin, 'ordem': inicio + posicao}
+            for posicao, pin in enumerate(livres[inicio:inicio + 5000])
+        ])
+    db.session.commit()
+    return len(livres)
+
+
+def garantir_lista():
+    """Monta a lista de PINs livres se ela ainda não existir (faz o commit)."""
+    if db.session.query(PinLivre.pin).first() is None and db.session.query(Membro.id).count() < TOTAL_PINS:
+        preencher()
+
+
+def _candidatos(quantidade):
+    """Condição de PIN não reservado e a consulta com os próximos 'quantidade' da lista."""
+    disponivel = or_(PinLivre.reservado_ate.is_(None), PinLivre.reservado_ate < datetime.utcnow())
+    candidatos = select(PinLivre.pin).where(disponivel).order_by(PinLivre.ordem).limit(quantidade)
+    # No PostgreSQL, linhas travadas por outra reserva em andamento são puladas
+    return disponivel, candidatos.with_for_update(skip_locked=True)
+
+
+def reservar(quantidade=3):
+    """
+    Separa 'quantidade' PINs livres por RESERVA_MINUTOS e os retorna. O
+    UPDATE ... RETURNING é atômico: dois cadastros abertos ao mesmo tempo
+    nunca recebem a mesma sugestão. Faz o commit da reserva.
+    """
+    garantir_lista()
+    disponivel, candidatos = _candidatos(quantidade)
+
+    pins = db.session.execute(
+        update(PinLivre).where(PinLivre.pin.in_(candidatos.scalar_subquery()), disponivel).values(
+            reservado_ate=datetime.utcnow() + timedelta(minutes=RESERVA_MINUTOS)
+        ).returning(PinLivre.pin).execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.session.commit()
+    return sorted(pins)
+
+
+def disponivel(pin):
+    """True se o PIN ainda não pertence a nenhum aluno (busca pela chave primária)."""
+    return db.session.get(PinLivre, pin) is not None
+
+
+def consumir(pin):
+    """
+    Tira o PIN da lista de livres, na transação do cadastro (sem commit).
+    Retorna False se outro cadastro já o usou.
+    """
+    return db.session.execute(delete(PinLivre).where(PinLivre.pin == pin)).rowcount == 1
+
+
+def consumir_varios(pins_escolhidos):
+    """
+    Versão em lote de consumir(), para a importação de alunos: tira da lista
+    os PINs informados (sem commit) e retorna o conjunto dos que estavam livres.
+    """
+    if not pins_escolhidos:
+        return set()
+    return set(db.session.execute(
+        delete(PinLivre).where(PinLivre.pin.in_(pins_escolhidos)).returning(PinLivre.pin)
+        .execution_options(synchronize_session=False)
+    ).scalars())
+
+
+def alocar(quantidade):
+    """
+    Tira da lista os próximos 'quantidade' PINs não reservados, com um único
+    DELETE ... RETURNING (sem commit). Pode retornar menos PINs se acabarem.
+    Chame garantir_lista() antes, fora da transação da importação.
+    """
+    if quantidade <= 0:
+        return []
+    disponivel, candidatos = _candidatos(quantidade)
+    return db.session.execute(
+        delete(PinLivre).where(PinLivre.pin.in_(candidatos.scalar_subquery()), disponivel).returning(PinLivre.pin)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
@@ -0,0 +1,110 @@
+# fitpro_academia/app/qrcodes.py
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import qrcode
+from flask import url_for
+
+# Mude quando o desenho do QR Code mudar: a versão entra na chave do cache
+VERSAO_DESENHO = 'v1-box10-borda5'
+
+
+def payload_checkin(aluno_id):
+    """Conteúdo do QR Code do aluno (o mesmo na tela, no cartão e no e-mail)."""
+    return url_for('main.api_checkin', aluno_id=aluno_id)
+
+
+def renderizar(payload):
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+class CacheQRCode:
+    """
+    Cache das imagens PNG dos QR Codes, com a chave sendo o hash do conteúdo.
+    Primeiro procura na memória (LRU com QRCODE_CACHE_ITENS imagens), depois
+    no disco (QRCODE_CACHE_DIR, por padrão instance/qrcodes) e só então gera
+    a imagem. A chave também serve de ETag, já que a imagem nunca muda para
+    o mesmo conteúdo.
+    """
+
+    def __init__(self):
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_itens = 1024
+        self.diretorio = None
+
+    def init_app(self, app):
+        self.max_itens = app.config.get('QRCODE_CACHE_ITENS', 1024)
+        self.diretorio = app.config.get('QRCODE_CACHE_DIR') or os.path.join(app.instance_path, 'qrcodes')
+
+    @staticmethod
+    def chave(payload):
+        return hashlib.sha256(f'{VERSAO_DESENHO}|{payload}'.encode('utf-8')).hexdigest()
+
+    def _caminho(self, chave):
+        # Subpastas pelos 2 primeiros caracteres para não juntar milhares de arquivos numa pasta só
+        return os.path.join(self.diretorio, chave[:2], f'{chave}.png')
+
+    def _guardar_na_memoria(self, chave, png):
+        with self._lock:
+            self._memoria[chave] = png
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.max_itens:
+                self._memoria.popitem(last=False)
+
+    def _ler_do_disco(self, chave):
+        try:
+            with open(self._caminho(chave), 'rb') as arquivo:
+                return arquivo.read()
+        except OSError:
+            return None
+
+    def _gravar_no_disco(self, chave, png):
+        caminho = self._caminho(chave)
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            # Grava num temporário e renomeia: quem lê nunca vê um arquivo pela metade
+            descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+            with os.fdopen(descritor, 'wb') as arquivo:
+                arquivo.write(png)
+            os.replace(temporario, caminho)
+        except OSError:
+            pass # Sem disco disponível o cache continua funcionando só na memória
+
+    def pre_renderizar(self, payload):
+        """Gera a imagem no disco, se ainda não existir. Retorna True se gerou."""
+        chave = self.chave(payload)
+        if os.path.exists(self._caminho(chave)):
+            return False
+        self._gravar_no_disco(chave, renderizar(payload))
+        return True
+
+    def obter(self, payload):
+        """Retorna (png, etag) do QR Code com o conteúdo 'payload'."""
+        chave = self.chave(payload)
+        with self._lock:
+            png = self._memoria.get(chave)
+            if png is not None:
+                self._memoria.move_to_end(chave)
+                return png, chave
+
+        png = self._ler_do_disco(chave)
+        if png is None:
+            png = renderizar(payload)
+            self._gravar_no_disco(chave, png)
+        self._guardar_na_memoria(chave, png)
+        return png, chave
+
+
+cache_qrcode = CacheQRCode()
@@ -0,0 +1,303 @@
+# fitpro_academia/app/resumos.py
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .arquivamento import fonte_frequencia
+from .models import Membro, Pagamento, ResumoDiario, ResumoMembro
+
+# Mesmos status que os relatórios sempre consideraram como receita
+STATUS_RECEITA = ('Confirmado', 'Arquivado')
+
+
+def dia_local(data_hora):
+    """Dia (no fuso UTC-3) de um horário gravado em UTC."""
+    return (data_hora - timedelta(hours=3)).date()
+
+
+def intervalo_utc(inicio, fim):
+    """Converte o intervalo de datas locais [inicio, fim] para horários UTC."""
+    return (datetime.combine(inicio, datetime.min.time()) + timedelta(hours=3),
+            datetime.combine(fim, datetime.max.time()) + timedelta(hours=3))
+
+
+def _bits(dados):
+    return int.from_bytes(dados or b'', 'little')
+
+
+def _bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def _inserir():
+    return postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+
+
+def _somar_aos_dias(por_dia):
+    """
+    Soma os contadores ({dia: {'checkins': n, 'novos_cadastros': n, 'receita':
+    valor}}) aos resumos com um único INSERT ... ON CONFLICT DO UPDATE SET
+    coluna = coluna + valor, sem ler nem travar as linhas antes. Os dias vão
+    em ordem para que transações concorrentes travem as linhas na mesma ordem.
+    """
+    colunas = ('checkins', 'novos_cadastros', 'receita')
+    valores = [
+        {'dia': dia, 'presentes': b'', **{coluna: por_dia[dia].get(coluna, 0) for coluna in colunas}}
+        for dia in sorted(por_dia)
+    ]
+    comando = _inserir()(ResumoDiario).values(valores)
+    db.session.execute(comando.on_conflict_do_update(
+        index_elements=['dia'],
+        set_={coluna: getattr(ResumoDiario, coluna) + getattr(comando.excluded, coluna) for coluna in colunas}
+    ))
+
+
+def _marcar_presentes(dia, bits):
+    """
+    Liga os bits dos alunos no mapa de presentes do dia (a linha já deve
+    existir). Como o OR do mapa não tem operador SQL portável, é feito como
+    compare-and-swap: o UPDATE só vale se o mapa ainda for o que foi lido, e
+    é repetido caso outra transação tenha mudado o mapa no meio. Quando os
+    alunos já estavam marcados (a maioria das entradas depois da primeira
+    do dia), nada é gravado.
+    """
+    while True:
+        atual = db.session.execute(select(ResumoDiario.presentes).where(ResumoDiario.dia == dia)).scalar()
+        antes = _bits(atual)
+        if antes | bits == antes:
+            return
+        alteradas = db.session.execute(
+            update(ResumoDiario).where(ResumoDiario.dia == dia, ResumoDiario.presentes == atual)
+            .values(presentes=_bytes(antes | bits)).execution_options(synchronize_session=False)
+        ).rowcount
+        if alteradas:
+            return
+
+
+def _resumos_dos_membros(membro_ids):
+    """
+    Garante que existe um resumo para cada aluno e os retorna travados
+    (SELECT ... FOR UPDATE no PostgreSQL) para serem alterados na transação
+    atual. Cada aluno tem a sua linha, então as travas não disputam entre si.
+    """
+    membro_ids = set(membro_ids)
+    valores = [{'membro_id': membro_id, 'total_visitas': 0, 'visitas_mes': 0} for membro_id in membro_ids]
+    db.session.execute(_inserir()(ResumoMembro).values(valores).on_conflict_do_nothing(index_elements=['membro_id']))
+
+    resumos = ResumoMembro.query.filter(ResumoMembro.membro_id.in_(membro_ids)).populate_existing().with_for_update()
+    return {resumo.membro_id: resumo for resumo in resumos}
+
+
+def _e_visita(tipo, status):
+    return tipo == 'Entrada' and status == 'Liberado'
+
+
+# --- Atualização incremental (chamada na mesma transação da escrita) ---
+
+def registrar_frequencias(linhas):
+    """Soma aos resumos os registros de frequência (dicts com membro_id, tipo e data_hora)."""
+    por_dia = defaultdict(list)
+    for linha in linhas:
+        por_dia[dia_local(linha['data_hora'])].append(linha)
+    if not por_dia:
+        return
+
+    _somar_aos_dias({
+        dia: {'checkins': sum(1 for registro in registros if registro['tipo'] == 'Entrada')}
+        for dia, registros in por_dia.items()
+    })
+    for dia, registros in sorted(por_dia.items()):
+        bits = 0
+        for registro in registros:
+            bits |= 1 << registro['membro_id']
+        _marcar_presentes(dia, bits)
+
+
+def registrar_visitas(linhas):
+    """Atualiza os resumos por aluno com as entradas liberadas entre as linhas de frequência."""
+    visitas = sorted((linha for linha in linhas if _e_visita(linha['tipo'], linha['status'])),
+                     key=lambda linha: linha['data_hora'])
+    if not visitas:
+        return
+
+    resumos = _resumos_dos_membros(visita['membro_id'] for visita in visitas)
+    for visita in visitas:
+        resumo = resumos[visita['membro_id']]
+        mes = dia_local(visita['data_hora']).replace(day=1)
+        resumo.total_visitas += 1
+        if resumo.ultima_visita is None or visita['data_hora'] > resumo.ultima_visita:
+            resumo.ultima_visita = visita['data_hora']
+        if resumo.mes_referencia is None or mes > resumo.mes_referencia:
+            resumo.mes_referencia = mes
+            resumo.visitas_mes = 1
+        elif mes == resumo.mes_referencia:
+            resumo.visitas_mes += 1
+        # Visitas de meses anteriores (sincronização atrasada) só entram no total
+
+
+def registrar_cadastros(datas_cadastro):
+    """Soma aos resumos os novos cadastros (lista de data_cadastro em UTC)."""
+    por_dia = defaultdict(int)
+    for data_cadastro in datas_cadastro:
+        por_dia[dia_local(data_cadastro)] += 1
+    if not por_dia:
+        return
+
+    _somar_aos_dias({dia: {'novos_cadastros': quantidade} for dia, quantidade in por_dia.items()})
+
+
+def ajustar_receita(pagamento, status_anterior):
+    """Atualiza a receita do dia do pagamento quando o status dele muda."""
+    contava = status_anterior in STATUS_RECEITA
+    conta = pagamento.status in STATUS_RECEITA
+    if contava == conta:
+        return
+
+    valor = Decimal(str(pagamento.valor))
+    _somar_aos_dias({dia_local(pagamento.data_pagamento): {'receita': valor if conta else -valor}})
+
+
+def descontar_pagamentos(pagamentos):
+    """
+    Tira da receita dos dias os pagamentos que vão ser apagados (objetos ou
+    linhas com data_pagamento, valor e status). Chamar antes do commit do DELETE.
+    """
+    por_dia = defaultdict(Decimal)
+    for pagamento in pagamentos:
+        if pagamento.status in STATUS_RECEITA:
+            por_dia[dia_local(pagamento.data_pagamento)] += Decimal(str(pagamento.valor))
+    if not por_dia:
+        return
+
+    _somar_aos_dias({dia: {'receita': -valor} for dia, valor in por_dia.items()})
+
+
+# --- Leitura ---
+
+def totais_periodo(inicio, fim):
+    """
+    Retorna (alunos únicos presentes, novos cadastros, receita) entre as datas
+    locais 'inicio' e 'fim', lendo no máximo uma linha por dia.
+    """
+    presentes = 0
+    novos_cadastros = 0
+    receita = Decimal(0)
+    for resumo in ResumoDiario.query.filter(ResumoDiario.dia.between(inicio, fim)):
+        presentes |= _bits(resumo.presentes)
+        novos_cadastros += resumo.novos_cadastros
+        receita += resumo.receita
+    return presentes.bit_count(), novos_cadastros, receita
+
+
+def visitas_do_membro(membro_id):
+    """Retorna {'total_visitas', 'ultima_visita', 'visitas_mes'} do aluno."""
+    resumo = db.session.get(ResumoMembro, membro_id)
+    if resumo is None:
+        return {'total_visitas': 0, 'ultima_visita': None, 'visitas_mes': 0}
+
+    mes_atual = dia_local(datetime.utcnow()).replace(day=1)
+    return {
+        'total_visitas': resumo.total_visitas,
+        'ultima_visita': resumo.ultima_visita,
+        # O contador do mês só vale se a última visita foi neste mês
+        'visitas_mes': resumo.visitas_mes if resumo.mes_referencia == mes_atual else 0,
+    }
+
+
+# --- Recalcular a partir das tabelas originais (carga inicial / correções) ---
+
+def _dia_local_sql(coluna):
+    if db.engine.dialect.name == 'sqlite':
+        return func.date(coluna, '-3 hours')
+    return func.date(coluna - timedelta(hours=3))
+
+
+def _como_data(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def primeiro_dia_com_dados():
+    """Dia local do registro mais antigo entre frequências, cadastros e pagamentos."""
+    datas = [
+        db.session.query(func.min(fonte_frequencia().data_hora)).scalar(),
+        db.session.query(func.min(Membro.data_cadastro)).scalar(),
+        db.session.query(func.min(Pagamento.data_pagamento)).scalar(),
+    ]
+    datas = [data for data in datas if data is not None]
+    return dia_local(min(datas)) if datas else None
+
+
+def recalcular(inicio, fim):
+    """
+    Refaz os resumos dos dias locais entre 'inicio' e 'fim' com consultas
+    agrupadas por dia e faz o commit. Retorna a quantidade de dias gravados.
+    """
+    inicio_utc, fim_utc = intervalo_utc(inicio, fim)
+    resumos = defaultdict(lambda: {'checkins': 0, 'presentes': 0, 'novos_cadastros': 0, 'receita': Decimal(0)})
+
+    frequencia = fonte_frequencia(inicio_utc)
+    dia = _dia_local_sql(frequencia.data_hora)
+    frequencias = select(
+        dia, frequencia.membro_id, func.sum(case((frequencia.tipo == 'Entrada', 1), else_=0))
+    ).where(frequencia.data_hora.between(inicio_utc, fim_utc)).group_by(dia, frequencia.membro_id)
+    for dia_registro, membro_id, entradas in db.session.execute(frequencias.execution_options(yield_per=5000)):
+        resumo = resumos[_como_data(dia_registro)]
+        resumo['presentes'] |= 1 << membro_id
+        resumo['checkins'] += entradas or 0
+
+    dia = _dia_local_sql(Membro.data_cadastro)
+    cadastros = select(dia, func.count(Membro.id)).where(
+        Membro.data_cadastro.between(inicio_utc, fim_utc)
+    ).group_by(dia)
+    for dia_registro, quantidade in db.session.execute(cadastros):
+        resumos[_como_data(dia_registro)]['novos_cadastros'] = quantidade
+
+    dia = _dia_local_sql(Pagamento.data_pagamento)
+    receitas = select(dia, func.sum(Pagamento.valor)).where(
+        Pagamento.status.in_(STATUS_RECEITA),
+        Pagamento.data_pagamento.between(inicio_utc, fim_utc)
+    ).group_by(dia)
+    for dia_registro, valor in db.session.execute(receitas):
+        resumos[_como_data(dia_registro)]['receita'] = Decimal(str(valor or 0))
+
+    ResumoDiario.query.filter(ResumoDiario.dia.between(inicio, fim)).delete(synchronize_session=False)
+    db.session.add_all(
+        ResumoDiario(dia=dia_resumo, checkins=valores['checkins'], presentes=_bytes(valores['presentes']),
+                     novos_cadastros=valores['novos_cadastros'], receita=valores['receita'])
+        for dia_resumo, valores in resumos.items()
+        if inicio <= dia_resumo <= fim
+    )
+    db.session.commit()
+    return len(resumos)
+
+
+def recalcular_membros():
+    """
+    Refaz todos os resumos por aluno com uma consulta agrupada por membro_id
+    e faz o commit. Retorna a quantidade de alunos com visitas.
+    """
+    mes_atual = dia_local(datetime.utcnow()).replace(day=1)
+    inicio_mes_utc = intervalo_utc(mes_atual, mes_atual)[0]
+
+    frequencia = fonte_frequencia()
+    consulta = select(
+        frequencia.membro_id, func.count(frequencia.id), func.max(frequencia.data_hora),
+        func.sum(case((frequencia.data_hora >= inicio_mes_utc, 1), else_=0))
+    ).where(frequencia.tipo == 'Entrada', frequencia.status == 'Liberado').group_by(frequencia.membro_id)
+
+    ResumoMembro.query.delete(synchronize_session=False)
+    total = 0
+    for lote in db.session.execute(consulta.execution_options(yield_per=5000)).partitions():
+        db.session.execute(insert(ResumoMembro), [
+            {'membro_id': membro_id, 'total_visitas': visitas, 'ultima_visita': ultima,
+             'mes_referencia': mes_atual, 'visitas_mes': visitas_mes or 0}
+            for membro_id, visitas, ultima, visitas_mes in lote
+        ])
+        total += len(lote)
+    db.session.commit()
+    return total
@@ -1,21 +1,34 @@
 # fitpro_academia/app/routes.py
-from flask import Blueprint, render_template, flash, redirect, url_for, request, current_app, jsonify, send_file
+from flask import (Blueprint, render_template, flash, redirect, url_for, request, current_app, jsonify, send_file,
+                   send_from_directory, Response, stream_with_context)
 from flask_login import current_user, login_user, logout_user, login_required
-from sqlalchemy import func, or_
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import joinedload
 from datetime import date, timedelta, datetime
-import qrcode
 import io
+import os
+import secrets
 import calendar
 import pandas as pd
-from flask_mail import Message
-from app import mail
-import random
 
-from . import db
+from . import coortes, db, emails, exportacao, importacao, pins, resumos
+from .analises import cache_analises
+from .anamneses import ASSUNTO_CONVITE, expirada as anamnese_expirada
+from .busca import filtrar_instrutores, filtrar_membros, prefixo_membros
+from .detalhe_aluno import carregar_detalhe
+from .elegibilidade import indice_elegibilidade, verificar_acesso
+from .eventos import canal_eventos
+from .frequencias import gravador_frequencia, sincronizar_leituras, tipo_da_leitura, MAX_LEITURAS_POR_LOTE
+from .ocupacao import contador_ocupacao
+from .painel import cache_painel
+from .qrcodes import cache_qrcode, payload_checkin
+from .tentativas import tentativas_pin
+from .paginacao import paginar_keyset
 from .models import (Membro, Plano, Matricula, Frequencia, Instrutor, 
-                     Pagamento, User, Treino, Aviso, Anamnese) # Adicione Anamnese aqui
+                     Pagamento, User, Treino, Aviso, Anamnese, treinos_membros) # Adicione Anamnese aqui
 from .forms import (CadastroAlunoForm, NovaMatriculaForm, CheckinForm, 
-                    InstrutorForm, AvisoForm, LoginForm, TreinoForm, AssociarTreinoForm, AnamneseForm)
+                    InstrutorForm, AvisoForm, LoginForm, TreinoForm, AssociarTreinoForm, AnamneseForm,
+                    ImportarAlunosForm)
 
 
 
@@ -50,61 +63,32 @@ def logout():
 @bp.route('/') # Esta agora é a rota do dashboard
 @login_required
 def index():
-    # Card 1: Total de Check-ins (entradas) hoje
-    hoje_utc = datetime.utcnow()
-    hoje_local = hoje_utc - timedelta(hours=3)
-    inicio_dia_utc = (hoje_local.replace(hour=0, minute=0, second=0, microsecond=0)) + timedelta(hours=3)
-    fim_dia_utc = (hoje_local.replace(hour=23, minute=59, second=59, microsecond=999999)) + timedelta(hours=3)
-    total_checkins_hoje = Frequencia.query.filter(Frequencia.tipo == 'Entrada', Frequencia.data_hora.between(inicio_dia_utc, fim_dia_utc)).count()
-
-    # Card 2: Receita confirmada hoje
-    receita_hoje = db.session.query(func.sum(Pagamento.valor)).filter(
-        Pagamento.status == 'Confirmado',
-        Pagamento.data_pagamento.between(inicio_dia_utc, fim_dia_utc)
-    ).scalar() or 0.0
-
-    # Card 3: Matrículas vencendo em 7 dias
-    proximos_7_dias = hoje_local.date() + timedelta(days=7)
-    vencendo_em_breve = Matricula.query.filter(
-        Matricula.status == 'Ativa',
-        Matricula.data_fim.between(hoje_local.date(), proximos_7_dias)
-    ).count()
-
-    # Card 4: Pagamentos pendentes
-    pagamentos_pendentes = Pagamento.query.filter(Pagamento.status == 'Pendente').count()
-
-    # Pega o aviso mais recente para o mural
-    aviso_ativo = Aviso.query.order_by(Aviso.data_criacao.desc()).first()
+    # Check-ins de hoje, receita de hoje, matrículas vencendo em 7 dias,
+    # pagamentos pendentes e o aviso mais recente: tudo num único SELECT,
+    # guardado em cache por alguns segundos (ver app/painel.py)
+    cards = cache_painel.obter()
 
     return render_template('dashboard.html',
-                           total_checkins_hoje=total_checkins_hoje,
-                           receita_hoje=f"{receita_hoje:.2f}",
-                           vencendo_em_breve=vencendo_em_breve,
-                           pagamentos_pendentes=pagamentos_pendentes,
-                           aviso_ativo=aviso_ativo)
+                           total_checkins_hoje=cards['total_checkins_hoje'],
+                           receita_hoje=f"{cards['receita_hoje']:.2f}",
+                           vencendo_em_breve=cards['vencendo_em_breve'],
+                           pagamentos_pendentes=cards['pagamentos_pendentes'],
+                           aviso_ativo=cards['aviso_ativo'])
 
 
 # --- Rotas de Gestão de Alunos (Membros) ---
 @bp.route('/aluno/<int:aluno_id>/qrcode')
 @login_required
 def gerar_qrcode(aluno_id):
-    # O dado que queremos embutir no QR Code. Usaremos uma URL simples para o futuro quiosque.
-    # Poderia ser apenas o ID, mas uma URL é mais flexível.
-    data = url_for('main.api_checkin', aluno_id=aluno_id)
-
-    # Gera o QR Code em memória
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(data)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-
-    # Salva a imagem em um buffer de bytes na memória
-    buf = io.BytesIO()
-    img.save(buf)
-    buf.seek(0)
-
-    # Retorna o buffer como uma imagem PNG
-    return send_file(buf, mimetype='image/png')
+    # O dado embutido no QR Code é o caminho da rota de check-in do quiosque.
+    # A imagem nunca muda para o mesmo aluno, então vem do cache e o navegador
+    # pode reaproveitá-la (ETag forte + 304 Not Modified).
+    png, etag = cache_qrcode.obter(payload_checkin(aluno_id))
+    resposta = Response(png, mimetype='image/png')
+    resposta.set_etag(etag)
+    resposta.cache_control.private = True
+    resposta.cache_control.max_age = 86400
+    return resposta.make_conditional(request)
 
 @bp.route('/quiosque')
 def quiosque():
@@ -115,43 +99,79 @@ def quiosque():
 
 @bp.route('/api/checkin/<int:aluno_id>', methods=['POST'])
 def api_checkin(aluno_id):
-    aluno = Membro.query.get(aluno_id)
-    if not aluno:
+    # A elegibilidade vem do índice em memória: nenhum SELECT por leitura de QR Code
+    acesso = verificar_acesso(aluno_id)
+    if acesso is None:
         return jsonify({'status': 'error', 'message': 'Aluno não encontrado.'}), 404
-
-    # --- Lógica de Check-in (igual à da outra rota) ---
+    dados = request.get_json(silent=True) or {}
+    return _registrar_checkin_quiosque(aluno_id, *acesso, tipo=tipo_da_leitura(dados))
+
+@bp.route('/api/checkin/pin', methods=['POST'])
+def api_checkin_pin():
+    # Teclado do quiosque: o PIN é resolvido pelo mesmo índice em memória do QR Code
+    quiosque_id = request.remote_addr
+    espera = tentativas_pin.bloqueado_por(quiosque_id)
+    if espera:
+        resposta = jsonify({'status': 'error', 'message': f'Muitas tentativas. Aguarde {espera} segundos.'})
+        return resposta, 429, {'Retry-After': str(espera)}
+
+    dados = request.get_json(silent=True) or request.form
+    pin = str(dados.get('pin', '')).strip()
+    aluno_id = indice_elegibilidade.membro_do_pin(pin) if len(pin) == 5 and pin.isdigit() else None
+    acesso = verificar_acesso(aluno_id) if aluno_id is not None else None
+    if acesso is None:
+        tentativas_pin.registrar_falha(quiosque_id)
+        return jsonify({'status': 'error', 'message': 'PIN não encontrado.'}), 404
+    return _registrar_checkin_quiosque(aluno_id, *acesso, tipo=tipo_da_leitura(dados))
+
+def _registrar_checkin_quiosque(aluno_id, aluno_nome, liberado, tipo='Entrada'):
+    # --- Lógica de Check-in (a mesma para QR Code e PIN) ---
     status_checkin = "Liberado"
-    message = f'Bem-vindo(a), {aluno.nome}!'
-    
-    matricula_valida = Matricula.query.filter(
-        Matricula.membro_id == aluno.id,
-        Matricula.status == 'Ativa',
-        Matricula.data_fim >= date.today()
-    ).first()
+    message = f'Bem-vindo(a), {aluno_nome}!'
 
-    if not matricula_valida:
+    if tipo == 'Saída':
+        # A saída é sempre liberada, mesmo com a matrícula irregular
+        message = f'Até logo, {aluno_nome}!'
+    elif not liberado:
         status_checkin = "Bloqueado - Matrícula Inválida"
-        message = f'Acesso Negado para {aluno.nome}. Matrícula irregular.'
+        message = f'Acesso Negado para {aluno_nome}. Matrícula irregular.'
 
-    # --- PARTE CRÍTICA QUE PROVAVELMENTE ESTAVA FALTANDO ---
-    # 1. Cria o novo registro de frequência
-    novo_checkin = Frequencia(membro_id=aluno.id, tipo='Entrada', status=status_checkin)
-    
-    # 2. Adiciona à sessão do banco de dados
-    db.session.add(novo_checkin)
-    
-    # 3. Salva permanentemente no banco de dados
-    db.session.commit()
-    # --- FIM DA PARTE CRÍTICA ---
+    # Grava o registro de frequência (direto ou pela fila, conforme a configuração)
+    gravador_frequencia.registrar(aluno_id, tipo, status_checkin)
     
     # A resposta de sucesso (200) é sempre enviada, mas o conteúdo muda
     return jsonify({
         'status': status_checkin,
+        'tipo': tipo,
         'message': message,
-        'aluno_nome': aluno.nome,
+        'aluno_nome': aluno_nome,
         'hora_checkin': datetime.now().strftime('%H:%M')
     })
 
+@bp.route('/api/checkin/lote', methods=['POST'])
+def api_checkin_lote():
+    # Recebe as leituras que o quiosque acumulou enquanto estava sem conexão
+    dados = request.get_json(silent=True) or {}
+    leituras = dados.get('leituras')
+    if not isinstance(leituras, list):
+        return jsonify({'status': 'error', 'message': "Envie um JSON com a lista 'leituras'."}), 400
+    if len(leituras) > MAX_LEITURAS_POR_LOTE:
+        return jsonify({'status': 'error', 'message': f'Envie no máximo {MAX_LEITURAS_POR_LOTE} leituras por lote.'}), 413
+
+    resultados = sincronizar_leituras(leituras)
+    return jsonify({'status': 'success', 'resultados': resultados})
+
+@bp.route('/api/ocupacao')
+def api_ocupacao():
+    # Para o painel da recepção consultar a cada poucos segundos: o número vem
+    # do contador em memória, sem nenhuma consulta à tabela frequencia
+    resposta = jsonify({
+        'ocupacao': contador_ocupacao.quantidade(),
+        'atualizado_em': datetime.utcnow().isoformat(timespec='seconds') + 'Z'
+    })
+    resposta.cache_control.no_store = True
+    return resposta
+
 @bp.route('/aluno/<int:aluno_id>/sucesso')
 @login_required
 def cadastro_sucesso(aluno_id):
@@ -164,17 +184,18 @@ def cadastro_sucesso(aluno_id):
 def lista_alunos():
     page = request.args.get('page', 1, type=int)
     termo_busca = request.args.get('busca', '')
-    # Novo: Pega o parâmetro de ordenação da URL. O padrão é 'nome'.
-    ordem = request.args.get('ordem', 'nome')
+    # Novo: Pega o parâmetro de ordenação da URL. O padrão é 'nome' (ou a relevância, numa busca).
+    ordem = request.args.get('ordem', 'relevancia' if termo_busca else 'nome')
     
     query = Membro.query.filter_by(status='Ativo')
+    relevancia = ()
     if termo_busca:
-        query = query.filter(
-            or_(Membro.nome.ilike(f'%{termo_busca}%'), Membro.cpf == termo_busca)
-        )
+        query, relevancia = filtrar_membros(query, termo_busca)
     
     # --- LÓGICA DE ORDENAÇÃO ATUALIZADA ---
-    if ordem == 'antigos':
+    if ordem == 'relevancia' and relevancia:
+        query = query.order_by(*relevancia, Membro.nome.asc())
+    elif ordem == 'antigos':
         query = query.order_by(Membro.data_cadastro.asc()) # .asc() = ascendente (do mais antigo para o mais novo)
     elif ordem == 'recentes':
         query = query.order_by(Membro.data_cadastro.desc()) # .desc() = descendente (do mais novo para o mais antigo)
@@ -188,41 +209,102 @@ def lista_alunos():
                            termo_busca=termo_busca,
                            ordem_ativa=ordem) # Envia a ordenação ativa para o template
 
+@bp.route('/api/alunos/busca')
+@login_required
+def api_busca_alunos():
+    # Alimenta os seletores de aluno (matrícula, treino) uma página por vez
+    termo = request.args.get('q', '')
+    limite = max(1, min(request.args.get('limite', 10, type=int), 20))
+    query, coluna = prefixo_membros(Membro.query.filter(Membro.status == 'Ativo'), termo)
+
+    treino_id = request.args.get('excluir_treino', type=int)
+    if treino_id:
+        query = query.filter(~exists().where(
+            treinos_membros.c.membro_id == Membro.id, treinos_membros.c.treino_id == treino_id
+        ))
+
+    pagina = paginar_keyset(query, coluna, Membro.id, por_pagina=limite,
+                            cursor=request.args.get('cursor'), descendente=False)
+    return jsonify({
+        'alunos': [{'id': aluno.id, 'nome': aluno.nome, 'cpf': aluno.cpf} for aluno in pagina.items],
+        'proximo': pagina.cursor_proximo,
+    })
+
 @bp.route('/aluno/novo', methods=['GET', 'POST'])
 @login_required
 def novo_aluno():
     form = CadastroAlunoForm()
-    if form.validate_on_submit():
+    if form.validate_on_submit() and pins.consumir(form.pin.data):
         novo_membro = Membro(
             nome=form.nome.data,
             cpf=form.cpf.data,
             pin=form.pin.data, 
             data_nascimento=form.data_nascimento.data,
             email=form.email.data,
-            telefone=form.telefone.data
+            telefone=form.telefone.data,
+            data_cadastro=datetime.utcnow()
         )
         db.session.add(novo_membro)
+        resumos.registrar_cadastros([novo_membro.data_cadastro])
         db.session.commit()
+        indice_elegibilidade.atualizar(novo_membro.id)
         flash('Aluno cadastrado com sucesso!', 'success')
         return redirect(url_for('main.cadastro_sucesso', aluno_id=novo_membro.id))
+    if form.is_submitted() and not form.errors:
+        # O PIN estava livre na validação, mas outro cadastro o usou antes deste
+        form.pin.errors.append('Este PIN acabou de ser usado. Escolha outro.')
 
-    # --- LÓGICA PARA GERAR SUGESTÕES DE PIN ---
-    sugestoes_pin = []
-    # Pega todos os PINs que já estão em uso
-    pins_existentes = {m.pin for m in Membro.query.with_entities(Membro.pin).all()}
-    while len(sugestoes_pin) < 3:
-        # Gera um número aleatório de 5 dígitos (com zeros à esquerda se necessário)
-        novo_pin = str(random.randint(0, 99999)).zfill(5)
-        if novo_pin not in pins_existentes and novo_pin not in sugestoes_pin:
-            sugestoes_pin.append(novo_pin)
+    # --- SUGESTÕES DE PIN: reservadas na lista de PINs livres ---
+    sugestoes_pin = pins.reservar(3)
 
     return render_template('novo_aluno.html', form=form, sugestoes_pin=sugestoes_pin)
 
+@bp.route('/alunos/importar', methods=['GET', 'POST'])
+@login_required
+def importar_alunos():
+    if current_user.role != 'admin':
+        flash('Acesso não autorizado.', 'danger')
+        return redirect(url_for('main.lista_alunos'))
+
+    form = ImportarAlunosForm()
+    resultado = None
+    if form.validate_on_submit():
+        arquivo = form.arquivo.data
+        pasta = os.path.join(current_app.instance_path, 'importacoes')
+        os.makedirs(pasta, exist_ok=True)
+        relatorio = f'rejeitados-{datetime.now():%Y%m%d-%H%M%S}-{secrets.token_hex(4)}.csv'
+        caminho = os.path.join(pasta, relatorio)
+        totais = None
+        try:
+            # O arquivo é lido aos poucos, direto do upload, e gravado em lotes
+            with open(caminho, 'w', newline='', encoding='utf-8-sig') as rejeitados:
+                totais = importacao.importar(arquivo.stream, arquivo.filename, rejeitados)
+        except ValueError as erro:
+            db.session.rollback()
+            flash(str(erro), 'danger')
+        finally:
+            # O relatório só fica se a importação terminar com linhas recusadas
+            if (totais is None or not totais['recusados']) and os.path.exists(caminho):
+                os.remove(caminho)
+        if totais is not None:
+            flash(f"{totais['importados']} aluno(s) importado(s), {totais['recusados']} linha(s) recusada(s).",
+                  'success' if not totais['recusados'] else 'warning')
+            resultado = dict(totais, relatorio=relatorio if totais['recusados'] else None)
+
+    return render_template('importar_alunos.html', form=form, resultado=resultado)
+
+@bp.route('/alunos/importar/<path:relatorio>')
+@login_required
+def relatorio_importacao(relatorio):
+    if current_user.role != 'admin':
+        return redirect(url_for('main.lista_alunos'))
+    return send_from_directory(os.path.join(current_app.instance_path, 'importacoes'), relatorio, as_attachment=True)
+
 @bp.route('/aluno/<int:aluno_id>')
 @login_required
 def aluno_detalhe(aluno_id):
     aluno = Membro.query.get_or_404(aluno_id)
-    return render_template('aluno_detalhe.html', aluno=aluno)
+    return render_template('aluno_detalhe.html', aluno=aluno, **carregar_detalhe(aluno))
 
 @bp.route('/aluno/<int:aluno_id>/editar', methods=['GET', 'POST'])
 @login_required
@@ -240,6 +322,7 @@ def editar_aluno(aluno_id):
         aluno.email = form.email.data
         aluno.telefone = form.telefone.data
         db.session.commit()
+        indice_elegibilidade.atualizar(aluno.id)
         flash('Dados do aluno atualizados com sucesso!', 'success')
         return redirect(url_for('main.lista_alunos'))
     
@@ -260,12 +343,14 @@ def excluir_aluno(aluno_id):
     # --- LÓGICA ALTERADA: EM VEZ DE DELETAR, INATIVAMOS ---
     aluno.status = 'Inativo'
     
-    # Opcional: inativar também as matrículas ativas dele
-    for matricula in aluno.matriculas:
-        if 'Ativa' in matricula.status_dinamico or 'Vence' in matricula.status_dinamico:
-            matricula.status = 'Cancelada'
+    # Opcional: inativar também as matrículas ativas dele (um único UPDATE)
+    Matricula.query.filter(Matricula.membro_id == aluno.id, Matricula.vigente).update(
+        {Matricula.status: 'Cancelada'}, synchronize_session=False
+    )
 
     db.session.commit()
+    indice_elegibilidade.atualizar(aluno.id)
+    cache_painel.invalidar()
     flash(f'Aluno "{aluno.nome}" foi inativado e removido das listas.', 'success')
     return redirect(url_for('main.lista_alunos'))
 
@@ -278,26 +363,20 @@ def enviar_anamnese(aluno_id):
     #    O token seguro é gerado automaticamente pelo modelo.
     nova_anamnese = Anamnese(membro_id=aluno.id)
     db.session.add(nova_anamnese)
-    db.session.commit()
+    db.session.flush()
 
     # 2. Cria o link único para o formulário usando o token gerado.
     #    'preencher_anamnese' é a rota que criaremos na próxima fase.
     link_formulario = url_for('main.preencher_anamnese', token=nova_anamnese.token, _external=True)
 
-    # 3. Envia o e-mail para o aluno com o link
-    try:
-        msg = Message(
-            subject='Complete seu Cadastro - Formulário de Anamnese GymFlow',
-            sender=('GymFlow', current_app.config['MAIL_USERNAME']),
-            recipients=[aluno.email]
-        )
-        # Renderiza o template do e-mail com as variáveis necessárias
-        msg.html = render_template('email/anamnese_invite.html', aluno=aluno, link_formulario=link_formulario)
-
-        mail.send(msg)
-        flash(f'E-mail com o formulário enviado para {aluno.email}!', 'success')
-    except Exception as e:
-        flash(f'Erro ao enviar e-mail: {e}', 'danger')
+    # 3. Coloca o e-mail com o link na fila de envio ('flask enviar-emails')
+    emails.enfileirar(
+        aluno.email,
+        ASSUNTO_CONVITE,
+        html=render_template('email/anamnese_invite.html', aluno=aluno, link_formulario=link_formulario)
+    )
+    db.session.commit()
+    flash(f'E-mail com o formulário colocado na fila de envio para {aluno.email}.', 'success')
 
     return redirect(url_for('main.aluno_detalhe', aluno_id=aluno.id))
 
@@ -319,8 +398,7 @@ def matriculas():
     desconto_config = current_app.config.get('DESCONTO_A_VISTA', 0.0)
     # --- FIM DAS LINHAS ADICIONADAS ---
     
-    # Popula as opções dos menus dropdown
-    form_matricula.membro.choices = [(m.id, m.nome) for m in Membro.query.filter_by(status='Ativo').order_by('nome').all()]
+    # Popula as opções do menu de planos (o aluno é escolhido pelo seletor com busca)
     form_matricula.plano.choices = [(p.id, f"{p.nome} (R$ {p.preco})") for p in planos]
     
     # Lógica de filtros e paginação (continua a mesma)
@@ -347,16 +425,27 @@ def matriculas():
         titulo_pagina = "Matrículas Vencidas"
         query_base = query_base.filter(Matricula.data_fim < hoje)
     else: # Filtro padrão 'ativas'
-        query_base = query_base.filter(Matricula.data_fim >= hoje)
+        query_base = query_base.filter(Matricula.vigente)
         
     matriculas_paginadas = query_base.order_by(Matricula.data_fim).paginate(page=page, per_page=4)
 
+    # Quantidade em cada aba, numa consulta agrupada pelo CASE de status_dinamico
+    status = select(Matricula.status_dinamico.label('status')).where(Matricula.status == 'Ativa').subquery()
+    por_status = dict(db.session.execute(select(status.c.status, func.count()).group_by(status.c.status)).all())
+    vencendo = sum(quantidade for nome, quantidade in por_status.items() if nome.startswith('Vence '))
+    contagens = {
+        'ativas': por_status.get('Ativa', 0) + vencendo,
+        '7dias': vencendo,
+        'vencidas': por_status.get('Vencida', 0),
+    }
+
     # Adiciona as variáveis que faltavam ao render_template
     return render_template('matricula.html', 
                            form_matricula=form_matricula, 
                            matriculas_paginadas=matriculas_paginadas,
                            filtro_ativo=filtro_ativo,
                            titulo_pagina=titulo_pagina,
+                           contagens=contagens,
                            planos_data=planos_data,
                            desconto_percentual=desconto_config)
 
@@ -366,6 +455,8 @@ def cancelar_matricula(matricula_id):
     matricula = Matricula.query.get_or_404(matricula_id)
     matricula.status = 'Cancelada'
     db.session.commit()
+    indice_elegibilidade.atualizar(matricula.membro_id)
+    cache_painel.invalidar()
     flash(f'A matrícula do plano {matricula.plano.nome} foi cancelada.', 'success')
     return redirect(request.referrer or url_for('main.matriculas'))
 
@@ -373,7 +464,6 @@ def cancelar_matricula(matricula_id):
 @login_required
 def matricular():
     form = NovaMatriculaForm()
-    form.membro.choices = [(m.id, m.nome) for m in Membro.query.filter_by(status='Ativo').order_by('nome').all()]
     form.plano.choices = [(p.id, f"{p.nome} (R$ {p.preco})") for p in Plano.query.order_by('nome').all()]
 
     plano_id = request.form.get('plano')
@@ -401,7 +491,7 @@ def matricular():
         data_fim = data_inicio + timedelta(days=plano_selecionado.duracao_dias)
 
         nova_matricula = Matricula(
-            membro_id=form.membro.data,
+            membro_id=form.aluno.id,
             plano_id=form.plano.data,
             data_inicio=data_inicio,
             data_fim=data_fim,
@@ -419,6 +509,8 @@ def matricular():
         db.session.add(nova_matricula)
         db.session.add(novo_pagamento)
         db.session.commit()
+        indice_elegibilidade.atualizar(nova_matricula.membro_id)
+        cache_painel.invalidar()
         flash('Matrícula e pagamento registrados com sucesso!', 'success')
         return redirect(url_for('main.matriculas'))
     else:
@@ -470,27 +562,21 @@ def treinos():
 @login_required
 def treino_detalhe(treino_id):
     treino = Treino.query.get_or_404(treino_id)
-    form = AssociarTreinoForm()
-    alunos_associados_ids = {membro.id for membro in treino.membros}
-    alunos_disponiveis = Membro.query.filter(Membro.status == 'Ativo', Membro.id.notin_(alunos_associados_ids)).order_by(Membro.nome).all()
-    form.membro.choices = [(a.id, a.nome) for a in alunos_disponiveis]
+    form = AssociarTreinoForm(treino=treino)
     return render_template('treino_detalhe.html', treino=treino, form=form)
 
 @bp.route('/treino/<int:treino_id>/associar', methods=['POST'])
 @login_required
 def associar_aluno_treino(treino_id):
     treino = Treino.query.get_or_404(treino_id)
-    form = AssociarTreinoForm()
-    alunos_associados_ids = {membro.id for membro in treino.membros}
-    alunos_disponiveis = Membro.query.filter(Membro.status == 'Ativo', Membro.id.notin_(alunos_associados_ids)).order_by(Membro.nome).all()
-    form.membro.choices = [(a.id, a.nome) for a in alunos_disponiveis]
+    form = AssociarTreinoForm(treino=treino)
     if form.validate_on_submit():
-        aluno = Membro.query.get_or_404(form.membro.data)
+        aluno = form.aluno
         treino.membros.append(aluno)
         db.session.commit()
         flash(f'{aluno.nome} foi associado ao treino "{treino.nome}" com sucesso!', 'success')
     else:
-        flash('Ocorreu um erro ao associar o aluno.', 'danger')
+        flash(form.membro.errors[0] if form.membro.errors else 'Ocorreu um erro ao associar o aluno.', 'danger')
     return redirect(url_for('main.treino_detalhe', treino_id=treino.id))
 
 @bp.route('/treino/<int:treino_id>/desassociar/<int:membro_id>', methods=['POST'])
@@ -532,13 +618,7 @@ def instrutores():
 
     query = Instrutor.query
     if termo_busca:
-        query = query.filter(
-            or_(
-                Instrutor.nome.ilike(f'%{termo_busca}%'),
-                Instrutor.cpf == termo_busca,
-                Instrutor.especialidade.ilike(f'%{termo_busca}%')
-            )
-        )
+        query = filtrar_instrutores(query, termo_busca)
 
     # Paginação de 3 em 3
     instrutores_paginados = query.order_by(Instrutor.nome).paginate(page=page, per_page=3)
@@ -548,9 +628,9 @@ def instrutores():
                            instrutores_paginados=instrutores_paginados,
                            termo_busca=termo_busca)
 
-# --- FUNÇÃO AUXILIAR PARA GERAR DADOS DO RELATÓRIO ---
-def _gerar_dados_relatorio(periodo):
-    """Função interna para calcular os dados de um relatório para um dado período."""
+# --- FUNÇÕES AUXILIARES PARA GERAR DADOS DO RELATÓRIO ---
+def _periodo_relatorio(periodo):
+    """Retorna (título, data inicial, data final, período) no horário local."""
     hoje_local = (datetime.utcnow() - timedelta(hours=3)).date()
     
     if periodo == 'diario':
@@ -583,21 +663,14 @@ def _gerar_dados_relatorio(periodo):
         titulo_relatorio = "Relatório Diário - " + hoje_local.strftime('%d/%m/%Y')
         inicio_periodo_data = fim_periodo_data = hoje_local
 
-    inicio_periodo_dt_local = datetime.combine(inicio_periodo_data, datetime.min.time())
-    fim_periodo_dt_local = datetime.combine(fim_periodo_data, datetime.max.time())
-    inicio_periodo_utc = inicio_periodo_dt_local + timedelta(hours=3)
-    fim_periodo_utc = fim_periodo_dt_local + timedelta(hours=3)
-
-    alunos_presentes = db.session.query(func.count(func.distinct(Frequencia.membro_id))).filter(
-        Frequencia.data_hora.between(inicio_periodo_utc, fim_periodo_utc)
-    ).scalar()
-    novos_cadastros = db.session.query(func.count(Membro.id)).filter(
-        Membro.data_cadastro.between(inicio_periodo_utc, fim_periodo_utc)
-    ).scalar()
-    receita = db.session.query(func.sum(Pagamento.valor)).filter(
-    Pagamento.status.in_(['Confirmado', 'Arquivado']),
-    Pagamento.data_pagamento.between(inicio_periodo_utc, fim_periodo_utc)
-    ).scalar() or 0.0
+    return titulo_relatorio, inicio_periodo_data, fim_periodo_data, periodo
+
+def _gerar_dados_relatorio(periodo):
+    """Função interna para calcular os dados de um relatório para um dado período."""
+    titulo_relatorio, inicio_periodo_data, fim_periodo_data, periodo = _periodo_relatorio(periodo)
+
+    # Os totais vêm da tabela de resumo diário: no máximo uma linha por dia do período
+    alunos_presentes, novos_cadastros, receita = resumos.totais_periodo(inicio_periodo_data, fim_periodo_data)
 
     relatorio = {
         'Alunos Únicos Presentes': alunos_presentes,
@@ -646,6 +719,66 @@ def exportar_planilhas():
         download_name=f'relatorio_{periodo_ativo}.xlsx'
     )
 
+@bp.route('/planilhas/exportar/detalhado')
+@login_required
+def exportar_planilhas_detalhado():
+    # Exporta cada check-in, pagamento e cadastro do período, linha a linha,
+    # sem montar o arquivo inteiro na memória
+    periodo_ativo = request.args.get('periodo', 'diario')
+    formato = request.args.get('formato', 'xlsx')
+    conjunto = request.args.get('conjunto', 'frequencia')
+
+    _, inicio_data, fim_data, periodo_ativo = _periodo_relatorio(periodo_ativo)
+    inicio_utc, fim_utc = resumos.intervalo_utc(inicio_data, fim_data)
+
+    if formato == 'csv':
+        if conjunto not in exportacao.CONJUNTOS:
+            flash('Conjunto de dados inválido para exportação.', 'danger')
+            return redirect(url_for('main.planilhas', periodo=periodo_ativo))
+        conteudo = exportacao.gerar_csv(conjunto, inicio_utc, fim_utc)
+        mimetype = 'text/csv'
+        nome_arquivo = f'{conjunto}_{periodo_ativo}.csv'
+    else:
+        conteudo = exportacao.gerar_xlsx(inicio_utc, fim_utc)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        nome_arquivo = f'relatorio_detalhado_{periodo_ativo}.xlsx'
+
+    return Response(stream_with_context(conteudo), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'})
+
+@bp.route('/planilhas/frequencia')
+@login_required
+def planilhas_frequencia():
+    # Mapa de calor por dia da semana e hora, e frequência por plano (ver app/analises.py)
+    periodo_ativo = request.args.get('periodo', 'mensal')
+    titulo_relatorio, inicio_data, fim_data, periodo_ativo = _periodo_relatorio(periodo_ativo)
+    analise = cache_analises.obter(inicio_data, fim_data)
+
+    return render_template('planilhas_frequencia.html',
+                           analise=analise,
+                           titulo_relatorio=titulo_relatorio,
+                           periodo_ativo=periodo_ativo)
+
+@bp.route('/planilhas/frequencia/dados')
+@login_required
+def planilhas_frequencia_dados():
+    # Os mesmos números da página, em JSON
+    periodo_ativo = request.args.get('periodo', 'mensal')
+    titulo_relatorio, inicio_data, fim_data, periodo_ativo = _periodo_relatorio(periodo_ativo)
+    analise = cache_analises.obter(inicio_data, fim_data)
+    return jsonify({'titulo': titulo_relatorio, 'periodo': periodo_ativo, **analise})
+
+@bp.route('/planilhas/coortes')
+@login_required
+def planilhas_coortes():
+    # Retenção por mês de cadastro: os meses fechados vêm de fotos gravadas,
+    # só o mês atual é recalculado (ver app/coortes.py)
+    quantidade_meses = request.args.get('meses', 12, type=int)
+    quantidade_meses = min(max(quantidade_meses, 1), 60)
+    return render_template('planilhas_coortes.html',
+                           relatorio=coortes.relatorio(quantidade_meses),
+                           quantidade_meses=quantidade_meses)
+
 @bp.route('/matricula/<int:matricula_id>/excluir', methods=['POST'])
 @login_required
 def excluir_matricula(matricula_id):
@@ -655,9 +788,12 @@ def excluir_matricula(matricula_id):
     aluno_id = matricula.membro_id
     plano_nome = matricula.plano.nome
     
-    # 2. Deleta o objeto do banco de dados
+    # 2. Deleta o objeto do banco de dados (os pagamentos vão junto, e saem da receita dos resumos)
+    resumos.descontar_pagamentos(matricula.pagamentos)
     db.session.delete(matricula)
     db.session.commit()
+    indice_elegibilidade.atualizar(aluno_id)
+    cache_painel.invalidar()
     
     # 3. Usa as informações guardadas para criar a mensagem
     flash(f'A matrícula do plano "{plano_nome}" foi removida do histórico permanentemente.', 'success')
@@ -666,37 +802,12 @@ def excluir_matricula(matricula_id):
     return redirect(url_for('main.aluno_detalhe', aluno_id=aluno_id))
 
 
-@bp.route('/frequencia', methods=['GET', 'POST'])
-@login_required
-def frequencia():
-    form = CheckinForm()
-    if form.validate_on_submit():
-        # ... (a lógica do POST para o formulário de check-in continua a mesma) ...
-        termo_busca = form.busca.data
-        aluno = Membro.query.filter(or_(Membro.cpf == termo_busca, Membro.nome.ilike(f'%{termo_busca}%'))).first()
-        if not aluno:
-            flash('Aluno não encontrado.', 'danger')
-        else:
-            status_checkin = "Liberado"
-            matricula_valida = Matricula.query.filter(
-                Matricula.membro_id == aluno.id,
-                Matricula.status == 'Ativa',
-                Matricula.data_fim >= date.today() # A verificação da data aqui pode continuar simples
-            ).first()
-            if not matricula_valida:
-                status_checkin = "Bloqueado - Matrícula Inválida"
-                flash(f'Atenção: Acesso registrado para {aluno.nome}, mas a matrícula está irregular.', 'warning')
-            else:
-                flash(f'Entrada registrada para {aluno.nome}!', 'success')
-            novo_checkin = Frequencia(membro_id=aluno.id, tipo='Entrada', status=status_checkin)
-            db.session.add(novo_checkin)
-            db.session.commit()
-        return redirect(url_for('main.frequencia'))
-    
+def consulta_frequencia(filtro_ativo):
+    """
+    Os registros de hoje da página de frequência, com o filtro de status.
+    Também usada pelo diagnóstico de índices (app/diagnostico.py).
+    """
     # --- LÓGICA DE FILTRAGEM DE HORÁRIO CORRIGIDA ---
-    page = request.args.get('page', 1, type=int)
-    filtro_ativo = request.args.get('filtro', 'todos')
-    
     # Define o "hoje" local (UTC-3)
     hoje_utc = datetime.utcnow()
     hoje_local = hoje_utc - timedelta(hours=3)
@@ -710,14 +821,46 @@ def frequencia():
     fim_dia_utc = fim_dia_local + timedelta(hours=3)
 
     # A consulta agora busca registros dentro deste intervalo de tempo preciso
-    query_base = Frequencia.query.filter(Frequencia.data_hora.between(inicio_dia_utc, fim_dia_utc))
+    query_base = Frequencia.query.options(joinedload(Frequencia.membro)).filter(
+        Frequencia.data_hora.between(inicio_dia_utc, fim_dia_utc)
+    )
 
     if filtro_ativo == 'Liberado':
         query_base = query_base.filter_by(status='Liberado')
     elif filtro_ativo == 'Bloqueado':
         query_base = query_base.filter(Frequencia.status.like('Bloqueado%'))
+    return query_base
 
-    registros_paginados = query_base.order_by(Frequencia.data_hora.desc()).paginate(page=page, per_page=5)
+
+@bp.route('/frequencia', methods=['GET', 'POST'])
+@login_required
+def frequencia():
+    form = CheckinForm()
+    if form.validate_on_submit():
+        # ... (a lógica do POST para o formulário de check-in continua a mesma) ...
+        termo_busca = form.busca.data
+        query, relevancia = filtrar_membros(Membro.query, termo_busca)
+        aluno = query.order_by(*relevancia, Membro.nome).first()
+        if not aluno:
+            flash('Aluno não encontrado.', 'danger')
+        else:
+            status_checkin = "Liberado"
+            acesso = verificar_acesso(aluno.id) # Mesma regra (e mesmo índice) do quiosque
+            if not (acesso and acesso[1]):
+                status_checkin = "Bloqueado - Matrícula Inválida"
+                flash(f'Atenção: Acesso registrado para {aluno.nome}, mas a matrícula está irregular.', 'warning')
+            else:
+                flash(f'Entrada registrada para {aluno.nome}!', 'success')
+            gravador_frequencia.registrar(aluno.id, 'Entrada', status_checkin)
+        return redirect(url_for('main.frequencia'))
+    
+    cursor = request.args.get('cursor')
+    filtro_ativo = request.args.get('filtro', 'todos')
+    query_base = consulta_frequencia(filtro_ativo)
+
+    # Paginação por chave (data_hora, id): sem OFFSET e com contagem limitada
+    registros_paginados = paginar_keyset(query_base, Frequencia.data_hora, Frequencia.id, por_pagina=5,
+                                         cursor=cursor, descendente=True, limite_contagem=1000)
 
     return render_template('frequencia.html', 
                            form=form, 
@@ -725,15 +868,28 @@ def frequencia():
                            filtro_ativo=filtro_ativo)
 
 
-@bp.route('/financeiro')
+@bp.route('/eventos')
 @login_required
-def financeiro():
-    page = request.args.get('page', 1, type=int)
-    filtro_status = request.args.get('status', 'todos')
-    filtro_periodo = request.args.get('periodo', 'todos')
-    ordem = request.args.get('ordem', 'recentes') # Novo: Pega o parâmetro de ordenação
-
-    query = Pagamento.query.filter(Pagamento.status != 'Arquivado')
+def eventos():
+    # Stream SSE com os check-ins e o total de check-ins de hoje: as páginas
+    # abertas se atualizam sem recarregar (ver app/eventos.py). Cada stream
+    # começa com o total atual, corrigindo o que se perdeu na reconexão.
+    cards = cache_painel.obter()
+    resposta = Response(canal_eventos.stream(iniciais=[('cards', {'total_checkins_hoje': cards['total_checkins_hoje']})]),
+                        mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no' # nginx não deve segurar o stream
+    return resposta
+
+
+def consulta_financeiro(filtro_status, filtro_periodo):
+    """
+    Os pagamentos não arquivados da página financeira, com os filtros de
+    status e período. Também usada pelo diagnóstico de índices.
+    """
+    query = Pagamento.query.options(
+        joinedload(Pagamento.matricula).joinedload(Matricula.membro)
+    ).filter(Pagamento.status != 'Arquivado')
 
     # Filtro de STATUS (sem alteração)
     if filtro_status != 'todos':
@@ -766,14 +922,23 @@ def financeiro():
         fim_utc = datetime.utcnow() # Até o momento atual
         query = query.filter(Pagamento.data_pagamento.between(inicio_utc, fim_utc))
     # 'todos' não precisa de filtro de data
+    return query
 
-    # --- LÓGICA DE ORDENAÇÃO ADICIONADA ---
-    if ordem == 'antigos':
-        query = query.order_by(Pagamento.data_pagamento.asc())
-    else: # Padrão é 'recentes'
-        query = query.order_by(Pagamento.data_pagamento.desc())
 
-    pagamentos_paginados = query.paginate(page=page, per_page=15)
+@bp.route('/financeiro')
+@login_required
+def financeiro():
+    cursor = request.args.get('cursor')
+    filtro_status = request.args.get('status', 'todos')
+    filtro_periodo = request.args.get('periodo', 'todos')
+    ordem = request.args.get('ordem', 'recentes') # Novo: Pega o parâmetro de ordenação
+    query = consulta_financeiro(filtro_status, filtro_periodo)
+
+    # --- ORDENAÇÃO E PAGINAÇÃO POR CHAVE (data_pagamento, id) ---
+    # Padrão é 'recentes'; 'antigos' inverte a ordem
+    pagamentos_paginados = paginar_keyset(query, Pagamento.data_pagamento, Pagamento.id, por_pagina=15,
+                                          cursor=cursor, descendente=(ordem != 'antigos'),
+                                          limite_contagem=1000)
     
     return render_template('financeiro.html', 
                            pagamentos_paginados=pagamentos_paginados,
@@ -791,8 +956,11 @@ def excluir_pagamento(pagamento_id):
         return redirect(url_for('main.financeiro'))
         
     # --- LÓGICA ALTERADA: EM VEZ DE DELETAR, ARQUIVAMOS ---
+    status_anterior = pagamento.status
     pagamento.status = 'Arquivado'
+    resumos.ajustar_receita(pagamento, status_anterior)
     db.session.commit()
+    cache_painel.invalidar()
     flash('Registro de pagamento arquivado e oculto da lista.', 'success')
     return redirect(request.referrer or url_for('main.financeiro'))
 
@@ -800,13 +968,17 @@ def excluir_pagamento(pagamento_id):
 @login_required
 def confirmar_pagamento(pagamento_id):
     pagamento = Pagamento.query.get_or_404(pagamento_id)
+    status_anterior = pagamento.status
     pagamento.status = 'Confirmado'
+    resumos.ajustar_receita(pagamento, status_anterior)
     
     # --- LINHA ADICIONADA PARA CORRIGIR O BUG ---
     # Garante que a matrícula associada seja marcada como 'Ativa'
     pagamento.matricula.status = 'Ativa'
     
     db.session.commit()
+    indice_elegibilidade.atualizar(pagamento.matricula.membro_id)
+    cache_painel.invalidar()
     flash('Pagamento confirmado e matrícula ativada com sucesso!', 'success')
     return redirect(url_for('main.financeiro'))
 
@@ -814,10 +986,14 @@ def confirmar_pagamento(pagamento_id):
 @login_required
 def cancelar_pagamento(pagamento_id):
     pagamento = Pagamento.query.get_or_404(pagamento_id)
+    status_anterior = pagamento.status
     pagamento.status = 'Cancelado'
+    resumos.ajustar_receita(pagamento, status_anterior)
     # Também cancelamos a matrícula associada
     pagamento.matricula.status = 'Cancelada'
     db.session.commit()
+    indice_elegibilidade.atualizar(pagamento.matricula.membro_id)
+    cache_painel.invalidar()
     flash('Pagamento e matrícula cancelados.', 'warning')
     return redirect(url_for('main.financeiro'))
 
@@ -900,6 +1076,7 @@ def gerenciar_avisos():
         novo_aviso = Aviso(conteudo=form.conteudo.data)
         db.session.add(novo_aviso)
         db.session.commit()
+        cache_painel.invalidar()
         flash('Aviso publicado com sucesso!', 'success')
         return redirect(url_for('main.gerenciar_avisos'))
 
@@ -915,6 +1092,7 @@ def excluir_aviso(aviso_id):
     aviso = Aviso.query.get_or_404(aviso_id)
     db.session.delete(aviso)
     db.session.commit()
+    cache_painel.invalidar()
     flash('Aviso excluído com sucesso.', 'success')
     return redirect(url_for('main.gerenciar_avisos'))
 
@@ -923,28 +1101,18 @@ def excluir_aviso(aviso_id):
 def enviar_qrcode(aluno_id):
     aluno = Membro.query.get_or_404(aluno_id)
 
-    # Gera a imagem do QR Code em memória (mesma lógica da outra rota)
-    qr_data = url_for('main.api_checkin', aluno_id=aluno.id, _external=True)
-    qr_img = qrcode.make(qr_data)
-    buf = io.BytesIO()
-    qr_img.save(buf)
-    buf.seek(0)
-
-    # Cria e envia o e-mail
-    try:
-        msg = Message(
-            subject='Seu Acesso GymFlow',
-            sender=('GymFlow', current_app.config['MAIL_USERNAME']),
-            recipients=[aluno.email]
-        )
-        msg.body = f'Olá, {aluno.nome}! Use o QR Code em anexo para fazer seu check-in na academia.'
-        # Anexa a imagem do QR Code gerada em memória
-        msg.attach('qrcode.png', 'image/png', buf.read())
+    # Mesma imagem (e mesmo cache) da rota gerar_qrcode
+    png, _ = cache_qrcode.obter(payload_checkin(aluno.id))
 
-        mail.send(msg)
-        flash(f'QR Code enviado com sucesso para o e-mail {aluno.email}!', 'success')
-    except Exception as e:
-        flash(f'Erro ao enviar e-mail: {e}', 'danger')
+    # Coloca o e-mail na fila de envio ('flask enviar-emails')
+    emails.enfileirar(
+        aluno.email,
+        'Seu Acesso GymFlow',
+        texto=f'Olá, {aluno.nome}! Use o QR Code em anexo para fazer seu check-in na academia.',
+        anexo=('qrcode.png', 'image/png', png)
+    )
+    db.session.commit()
+    flash(f'E-mail com o QR Code colocado na fila de envio para {aluno.email}.', 'success')
 
     return redirect(url_for('main.aluno_detalhe', aluno_id=aluno.id))
 
@@ -958,6 +1126,8 @@ def preencher_anamnese(token):
     if anamnese.data_preenchimento is not None:
         flash('Este formulário já foi preenchido e não pode ser alterado.', 'warning')
         return render_template('formulario_sucesso.html', mensagem="Formulário já respondido.")
+    if anamnese_expirada(anamnese):
+        return render_template('formulario_sucesso.html', mensagem="Este link expirou. Peça um novo na recepção."), 410
 
     form = AnamneseForm()
     if form.validate_on_submit():
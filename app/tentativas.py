@@ -0,0 +1,49 @@
+# fitpro_academia/app/tentativas.py
+
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class ControleTentativas:
+    """
+    Conta as tentativas erradas de PIN de cada quiosque numa janela
+    deslizante. Com QUIOSQUE_PIN_MAX_FALHAS erros em QUIOSQUE_PIN_JANELA
+    segundos, o quiosque fica bloqueado até o erro mais antigo sair da janela.
+    Acertos não zeram a contagem, para que um PIN conhecido não sirva de
+    "reset" num ataque de força bruta. Os contadores são por processo.
+    """
+
+    def __init__(self):
+        self._falhas = defaultdict(deque)
+        self._lock = threading.Lock()
+        self.max_falhas = 5
+        self.janela = 60
+
+    def init_app(self, app):
+        self.max_falhas = app.config.get('QUIOSQUE_PIN_MAX_FALHAS', 5)
+        self.janela = app.config.get('QUIOSQUE_PIN_JANELA', 60)
+
+    def _limpar(self, chave, agora):
+        falhas = self._falhas[chave]
+        while falhas and agora - falhas[0] >= self.janela:
+            falhas.popleft()
+        if not falhas:
+            del self._falhas[chave]
+        return falhas
+
+    def bloqueado_por(self, chave):
+        """Segundos que faltam para o quiosque poder tentar de novo (0 se liberado)."""
+        agora = time.monotonic()
+        with self._lock:
+            falhas = self._limpar(chave, agora)
+            if len(falhas) < self.max_falhas:
+                return 0
+            return max(1, int(falhas[0] + self.janela - agora + 0.999))
+
+    def registrar_falha(self, chave):
+        with self._lock:
+            self._falhas[chave].append(time.monotonic())
+
+
+tentativas_pin = ControleTentativas()
@@ -24,12 +24,82 @@ class Config:
     # Desconto em porcentagem para pagamentos à vista (PIX/Débito)
     DESCONTO_A_VISTA = 10.0
 
-    MAIL_SERVER = 'smtp.googlemail.com'
-    MAIL_PORT = 587
-    MAIL_USE_TLS = True
+    # Intervalo (em segundos) para remontar por completo, numa thread, o índice
+    # de elegibilidade do quiosque, que fica em memória em cada worker (as
+    # alterações chegam antes, pela tabela alteracao_elegibilidade). 0 desliga.
+    ELEGIBILIDADE_TTL = int(os.environ.get('ELEGIBILIDADE_TTL', 300))
+
+    # Gravação em lote dos check-ins (desligada por padrão).
+    # Quando ligada, os registros de frequência são gravados a cada
+    # INTERVALO_MS milissegundos ou a cada MAX_LINHAS registros, o que vier antes.
+    FREQUENCIA_BUFFER_ATIVO = os.environ.get('FREQUENCIA_BUFFER_ATIVO', '0') == '1'
+    FREQUENCIA_BUFFER_INTERVALO_MS = int(os.environ.get('FREQUENCIA_BUFFER_INTERVALO_MS', 500))
+    FREQUENCIA_BUFFER_MAX_LINHAS = int(os.environ.get('FREQUENCIA_BUFFER_MAX_LINHAS', 200))
+    # Um lote que falha FREQUENCIA_BUFFER_TENTATIVAS vezes seguidas é gravado linha
+    # a linha, descartando (no log) as linhas recusadas; a fila guarda no máximo
+    # MAX_FILA registros, e além disso cada check-in é gravado na hora
+    FREQUENCIA_BUFFER_TENTATIVAS = int(os.environ.get('FREQUENCIA_BUFFER_TENTATIVAS', 5))
+    FREQUENCIA_BUFFER_MAX_FILA = int(os.environ.get('FREQUENCIA_BUFFER_MAX_FILA', 10000))
+
+    # Tempo (em segundos) que os cards do dashboard ficam em cache
+    PAINEL_CACHE_TTL = int(os.environ.get('PAINEL_CACHE_TTL', 30))
+
+    # Teclado de PIN do quiosque: com MAX_FALHAS PINs errados em JANELA
+    # segundos, o quiosque (identificado pelo IP) fica bloqueado até a janela passar.
+    QUIOSQUE_PIN_MAX_FALHAS = int(os.environ.get('QUIOSQUE_PIN_MAX_FALHAS', 5))
+    QUIOSQUE_PIN_JANELA = int(os.environ.get('QUIOSQUE_PIN_JANELA', 60))
+
+    # Contador de ocupação (/api/ocupacao): depois de PERMANENCIA_HORAS sem
+    # registrar a saída o aluno deixa de contar; em cada worker uma thread
+    # recarrega o contador do banco a cada OCUPACAO_TTL segundos (0 desliga)
+    OCUPACAO_PERMANENCIA_HORAS = float(os.environ.get('OCUPACAO_PERMANENCIA_HORAS', 4))
+    OCUPACAO_TTL = int(os.environ.get('OCUPACAO_TTL', 60))
+
+    # Stream /eventos (frequência e dashboard ao vivo): eventos guardados por
+    # aba antes de descartar os de uma conexão lenta, segundos entre os
+    # "pings" que mantêm a conexão aberta e segundos até o stream ser fechado
+    # (o navegador reconecta sozinho; assim uma aba não prende uma thread para sempre)
+    EVENTOS_MAX_FILA = int(os.environ.get('EVENTOS_MAX_FILA', 100))
+    EVENTOS_HEARTBEAT = int(os.environ.get('EVENTOS_HEARTBEAT', 15))
+    EVENTOS_DURACAO = int(os.environ.get('EVENTOS_DURACAO', 60))
+
+    # Mapa de calor e frequência por plano (Planilhas > Frequência): períodos
+    # guardados em memória e segundos até recalcular um período que inclui hoje
+    ANALISES_CACHE_ITENS = int(os.environ.get('ANALISES_CACHE_ITENS', 32))
+    ANALISES_CACHE_TTL = int(os.environ.get('ANALISES_CACHE_TTL', 300))
+
+    # Cache das imagens de QR Code: quantas ficam na memória de cada worker e
+    # a pasta onde ficam gravadas (padrão: instance/qrcodes)
+    QRCODE_CACHE_ITENS = int(os.environ.get('QRCODE_CACHE_ITENS', 1024))
+    QRCODE_CACHE_DIR = os.environ.get('QRCODE_CACHE_DIR')
+
+    # Para testar localmente sem enviar nada de verdade, suba um servidor SMTP
+    # de teste (ex.: 'python -m aiosmtpd -n -l localhost:1025') e use
+    # MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=0
+    MAIL_SERVER = os.environ.get('MAIL_SERVER', 'smtp.googlemail.com')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', '1') == '1'
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
 
+    # Fila de e-mails ('flask enviar-emails'): quantos e-mails por conexão SMTP,
+    # quantas tentativas antes de desistir e a espera (em segundos) antes da
+    # segunda tentativa, que dobra a cada nova falha. EMAIL_POR_MINUTO limita o
+    # ritmo de envio para não estourar a cota do servidor SMTP (0 = sem limite)
+    EMAIL_LOTE = int(os.environ.get('EMAIL_LOTE', 50))
+    EMAIL_MAX_TENTATIVAS = int(os.environ.get('EMAIL_MAX_TENTATIVAS', 6))
+    EMAIL_ESPERA_INICIAL = int(os.environ.get('EMAIL_ESPERA_INICIAL', 60))
+    EMAIL_POR_MINUTO = int(os.environ.get('EMAIL_POR_MINUTO', 60))
+
+    # Endereço público do sistema, usado nos links dos e-mails montados fora de
+    # uma requisição (ex.: 'flask convidar-anamnese'). Ex.: https://academia.exemplo.com
+    URL_BASE = os.environ.get('URL_BASE')
+    # Dias até o link de um formulário de anamnese não respondido expirar
+    ANAMNESE_VALIDADE_DIAS = int(os.environ.get('ANAMNESE_VALIDADE_DIAS', 30))
+    # Dias de check-ins mantidos na tabela frequencia; os mais antigos vão para
+    # frequencia_arquivo com 'flask arquivar-frequencias'
+    FREQUENCIA_RETENCAO_DIAS = int(os.environ.get('FREQUENCIA_RETENCAO_DIAS', 180))
+
 
     
     
\ No newline at end of file
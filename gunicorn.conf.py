@@ -0,0 +1,19 @@
+# fitpro_academia/gunicorn.conf.py
+
+# Lido automaticamente pelo gunicorn quando ele é iniciado na raiz do projeto
+# (ex.: 'gunicorn run:app'). O stream /eventos mantém uma conexão aberta por
+# aba do dashboard/frequência; com os workers síncronos padrão, poucas abas
+# ocupariam todos os workers. Com 'gthread' cada conexão usa uma thread.
+#
+# Os eventos ao vivo (app/eventos.py) são entregues só dentro do mesmo
+# processo: uma aba só vê os check-ins gravados pelo worker dela.
+# Por isso o padrão é um único worker; para atender mais abas, aumente
+# GUNICORN_THREADS. Com mais de um worker, cada página só vê parte dos
+# check-ins ao vivo (o total é corrigido a cada reconexão do stream).
+import os
+
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 64))
+# O stream é encerrado após EVENTOS_DURACAO segundos; o timeout precisa ser maior
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
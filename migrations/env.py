@@ -90,9 +90,17 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # a tabela FTS5 (SQLite) e o índice trigram (PostgreSQL) da busca por nome
+    # são criados à mão na migração e não existem nos modelos; as partições
+    # mensais de frequencia_arquivo (PostgreSQL) são criadas pelo arquivamento
+    def include_name(name, type_, parent_names):
+        return not (name or '').startswith(('membro_fts', 'ix_membro_nome_busca_trgm', 'frequencia_arquivo_'))
+
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_name") is None:
+        conf_args["include_name"] = include_name
 
     connectable = get_engine()
 
@@ -0,0 +1,59 @@
+"""Índices compostos para as consultas frequentes
+
+Revision ID: d986d9580c47
+Revises: 56e096168c91
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd986d9580c47'
+down_revision = '56e096168c91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('frequencia', schema=None) as batch_op:
+        batch_op.create_index('ix_frequencia_data_hora_tipo_status', ['data_hora', 'tipo', 'status'], unique=False)
+        batch_op.create_index('ix_frequencia_membro_id_data_hora', ['membro_id', 'data_hora'], unique=False)
+
+    with op.batch_alter_table('matricula', schema=None) as batch_op:
+        batch_op.create_index('ix_matricula_membro_id_status_data_fim', ['membro_id', 'status', 'data_fim'], unique=False)
+
+    with op.batch_alter_table('pagamento', schema=None) as batch_op:
+        batch_op.create_index('ix_pagamento_status_data_pagamento', ['status', 'data_pagamento'], unique=False)
+        batch_op.create_index('ix_pagamento_matricula_id', ['matricula_id'], unique=False)
+
+    with op.batch_alter_table('membro', schema=None) as batch_op:
+        batch_op.create_index('ix_membro_status_nome', ['status', 'nome'], unique=False)
+
+    # Índices parciais (suportados pelo SQLite e pelo PostgreSQL)
+    op.create_index('ix_matricula_ativa_data_fim', 'matricula', ['data_fim'], unique=False,
+                    sqlite_where=sa.text("status = 'Ativa'"),
+                    postgresql_where=sa.text("status = 'Ativa'"))
+    op.create_index('ix_pagamento_nao_arquivado_data_pagamento', 'pagamento', ['data_pagamento'], unique=False,
+                    sqlite_where=sa.text("status <> 'Arquivado'"),
+                    postgresql_where=sa.text("status <> 'Arquivado'"))
+
+
+def downgrade():
+    op.drop_index('ix_pagamento_nao_arquivado_data_pagamento', table_name='pagamento')
+    op.drop_index('ix_matricula_ativa_data_fim', table_name='matricula')
+
+    with op.batch_alter_table('membro', schema=None) as batch_op:
+        batch_op.drop_index('ix_membro_status_nome')
+
+    with op.batch_alter_table('pagamento', schema=None) as batch_op:
+        batch_op.drop_index('ix_pagamento_matricula_id')
+        batch_op.drop_index('ix_pagamento_status_data_pagamento')
+
+    with op.batch_alter_table('matricula', schema=None) as batch_op:
+        batch_op.drop_index('ix_matricula_membro_id_status_data_fim')
+
+    with op.batch_alter_table('frequencia', schema=None) as batch_op:
+        batch_op.drop_index('ix_frequencia_membro_id_data_hora')
+        batch_op.drop_index('ix_frequencia_data_hora_tipo_status')
@@ -1,44 +1,223 @@
 # fitpro_academia/run.py
 
+import os
+from datetime import datetime, timedelta
+
+import click
+
 from app import create_app, db
-from app.models import Membro, Matricula
+from app.models import Membro
 
 # Cria a instância da aplicação
 app = create_app()
 
 # --- INÍCIO DO NOVO COMANDO CUSTOMIZADO ---
+def _limpar_orfaos(dry_run, lote, apenas=None):
+    from app import manutencao
+
+    print("--- Iniciando limpeza de registros órfãos" + (" (simulação, nada será apagado)" if dry_run else "") + " ---")
+    total = manutencao.limpar_orfaos(
+        simular=dry_run, lote=lote, apenas=apenas,
+        relatorio=lambda descricao, quantidade, segundos: print(f"{descricao}: {quantidade} linha(s) em {segundos:.2f}s")
+    )
+    if not total:
+        print("\nBOA NOTÍCIA: Nenhum registro órfão foi encontrado!")
+    elif dry_run:
+        print(f"\n{total} registro(s) órfão(s) seriam removidos.")
+    else:
+        print(f"\nLimpeza concluída: {total} registro(s) órfão(s) removido(s).")
+
+
+@app.cli.command("limpar-orfaos")
+@click.option("--dry-run", is_flag=True, help="Só conta os registros órfãos, sem apagar nada.")
+@click.option("--lote", default=5000, show_default=True, help="Linhas apagadas por DELETE/commit.")
+def limpar_orfaos(dry_run, lote):
+    """Remove matrículas, pagamentos, frequências, anamneses e vínculos de treino sem o registro pai."""
+    _limpar_orfaos(dry_run, lote)
+
+
 @app.cli.command("limpar-matriculas")
-def limpar_matriculas_orfans():
-    """Encontra e remove matrículas órfãs do banco de dados."""
-    print("--- Iniciando script de limpeza de matrículas órfãs ---")
-    try:
-        # Pega todos os IDs de Membros válidos
-        ids_de_membros_validos = {membro.id for membro in Membro.query.all()}
-        print(f"Alunos válidos encontrados: {len(ids_de_membros_validos)}")
-        
-        # Pega todas as matrículas
-        todas_as_matriculas = Matricula.query.all()
-        print(f"Verificando {len(todas_as_matriculas)} matrículas...")
-        
-        # Encontra as órfãs usando list comprehension
-        matriculas_para_deletar = [m for m in todas_as_matriculas if m.membro_id not in ids_de_membros_validos]
-        
-        if not matriculas_para_deletar:
-            print("\nBOA NOTÍCIA: Nenhuma matrícula órfã foi encontrada!")
-        else:
-            print(f"\nEncontradas {len(matriculas_para_deletar)} matrículas órfãs para deletar.")
-            for m in matriculas_para_deletar:
-                db.session.delete(m)
-            
-            db.session.commit()
-            print("Limpeza concluída com sucesso!")
-    except Exception as e:
-        print(f"Ocorreu um erro: {e}")
-        db.session.rollback()
-    
-    print("--- Script finalizado ---")
+@click.option("--dry-run", is_flag=True, help="Só conta as matrículas órfãs, sem apagar nada.")
+@click.option("--lote", default=5000, show_default=True, help="Linhas apagadas por DELETE/commit.")
+def limpar_matriculas_orfans(dry_run, lote):
+    """Remove só as matrículas órfãs (atalho mantido de 'flask limpar-orfaos')."""
+    _limpar_orfaos(dry_run, lote, apenas='matricula')
 # --- FIM DO NOVO COMANDO CUSTOMIZADO ---
 
 
+@app.cli.command("verificar-indices")
+def verificar_indices():
+    """Confere com EXPLAIN se as consultas mais usadas estão usando os índices."""
+    from app.diagnostico import verificar_indices as verificar
+
+    falhas = 0
+    for descricao, indice, usou_indice, plano in verificar():
+        situacao = "OK   " if usou_indice else "FALHA"
+        print(f"[{situacao}] {descricao} -> {indice}")
+        if not usou_indice:
+            falhas += 1
+            print("        " + plano.replace("\n", "\n        "))
+
+    if falhas:
+        print(f"\n{falhas} consulta(s) não estão usando o índice esperado.")
+        raise SystemExit(1)
+    print("\nTodas as consultas estão usando os índices esperados.")
+
+
+@app.cli.command("recalcular-resumos")
+@click.option("--inicio", type=click.DateTime(formats=["%Y-%m-%d"]), help="Primeiro dia (padrão: o dia do registro mais antigo).")
+@click.option("--fim", type=click.DateTime(formats=["%Y-%m-%d"]), help="Último dia (padrão: hoje).")
+def recalcular_resumos(inicio, fim):
+    """Preenche (ou refaz) os resumos diários e por aluno a partir dos dados existentes."""
+    from app import resumos
+
+    inicio = inicio.date() if inicio else resumos.primeiro_dia_com_dados()
+    fim = fim.date() if fim else resumos.dia_local(datetime.utcnow())
+    if inicio is None:
+        print("Nenhum dado para resumir.")
+        return
+
+    # Processa um mês por vez para manter a memória sob controle
+    total_dias = 0
+    bloco_inicio = inicio
+    while bloco_inicio <= fim:
+        bloco_fim = min(fim, (bloco_inicio.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1))
+        total_dias += resumos.recalcular(bloco_inicio, bloco_fim)
+        print(f"{bloco_inicio:%m/%Y}: resumos recalculados.")
+        bloco_inicio = bloco_fim + timedelta(days=1)
+
+    print(f"Concluído: {total_dias} dia(s) com movimento entre {inicio:%d/%m/%Y} e {fim:%d/%m/%Y}.")
+
+    total_alunos = resumos.recalcular_membros()
+    print(f"Resumos por aluno recalculados: {total_alunos} aluno(s) com visitas.")
+
+
+@app.cli.command("gerar-qrcodes")
+@click.option("--todos", is_flag=True, help="Inclui os alunos inativos.")
+def gerar_qrcodes(todos):
+    """Gera no cache em disco os QR Codes que ainda não existem (para cartões e e-mails)."""
+    from app.qrcodes import cache_qrcode, payload_checkin
+
+    consulta = db.session.query(Membro.id).order_by(Membro.id)
+    if not todos:
+        consulta = consulta.filter(Membro.status == 'Ativo')
+
+    gerados = existentes = 0
+    # url_for precisa de um contexto de requisição para montar o conteúdo do QR Code
+    with app.test_request_context():
+        for (aluno_id,) in consulta.yield_per(1000):
+            if cache_qrcode.pre_renderizar(payload_checkin(aluno_id)):
+                gerados += 1
+                if gerados % 500 == 0:
+                    print(f"{gerados} QR Codes gerados...")
+            else:
+                existentes += 1
+
+    print(f"Concluído: {gerados} gerado(s), {existentes} já estavam no cache ({cache_qrcode.diretorio}).")
+
+
+@app.cli.command("enviar-emails")
+@click.option("--continuo", is_flag=True, help="Continua rodando e verificando a fila periodicamente.")
+@click.option("--intervalo", default=10, show_default=True, help="Segundos entre as verificações no modo contínuo.")
+@click.option("--lote", type=int, help="E-mails enviados por conexão SMTP (padrão: EMAIL_LOTE).")
+def enviar_emails(continuo, intervalo, lote):
+    """Envia os e-mails da fila (convites de anamnese, QR Codes...)."""
+    from app import emails
+
+    enviados, adiados = emails.processar_fila(continuo=continuo, intervalo=intervalo, limite=lote)
+    print(f"Concluído: {enviados} e-mail(s) enviado(s), {adiados} adiado(s) para nova tentativa.")
+
+
+@app.cli.command("enviar-lembretes")
+@click.option("--dias", default=7, show_default=True, help="Avisa as matrículas que vencem nos próximos N dias.")
+@click.option("--dias-vencidas", default=30, show_default=True, help="Avisa as matrículas vencidas há até N dias.")
+@click.option("--enviar", is_flag=True, help="Já envia a fila de e-mails depois de montar os lembretes.")
+def enviar_lembretes(dias, dias_vencidas, enviar):
+    """Coloca na fila os lembretes de matrícula vencendo/vencida (para rodar uma vez por dia no agendador)."""
+    from app import emails, lembretes
+
+    total = lembretes.enfileirar_lembretes(dias=dias, dias_vencidas=dias_vencidas)
+    print(f"{total} lembrete(s) de vencimento colocado(s) na fila.")
+
+    if enviar:
+        enviados, adiados = emails.processar_fila()
+        print(f"Fila de e-mails: {enviados} enviado(s), {adiados} adiado(s) para nova tentativa.")
+
+
+@app.cli.command("convidar-anamnese")
+@click.option("--enviar", is_flag=True, help="Já envia a fila de e-mails depois de criar os convites.")
+def convidar_anamnese(enviar):
+    """Convida todos os alunos ativos (sem convite válido pendente) a preencher a anamnese."""
+    from app import anamneses, emails
+
+    if not app.config.get('URL_BASE'):
+        raise click.ClickException("Defina URL_BASE (ex.: https://academia.exemplo.com) para montar os links dos e-mails.")
+
+    apagadas = anamneses.limpar_expiradas()
+    print(f"{apagadas} convite(s) expirado(s) sem resposta removido(s).")
+
+    # url_for precisa de um contexto de requisição para montar os links externos
+    with app.test_request_context(base_url=app.config['URL_BASE']):
+        total = anamneses.convidar_todos(progresso=lambda feitos, total: print(f"{feitos}/{total} convites na fila..."))
+    print(f"Concluído: {total} convite(s) de anamnese colocado(s) na fila.")
+
+    if enviar:
+        enviados, adiados = emails.processar_fila(
+            progresso=lambda enviados, adiados: print(f"{enviados} e-mail(s) enviado(s), {adiados} adiado(s)...")
+        )
+        print(f"Fila de e-mails: {enviados} enviado(s), {adiados} adiado(s) para nova tentativa.")
+
+
+@app.cli.command("limpar-convites")
+def limpar_convites():
+    """Remove os convites de anamnese que expiraram sem resposta."""
+    from app import anamneses
+
+    print(f"{anamneses.limpar_expiradas()} convite(s) expirado(s) removido(s).")
+
+
+@app.cli.command("importar-alunos")
+@click.argument("arquivo", type=click.Path(exists=True, dir_okay=False))
+@click.option("--rejeitados", type=click.Path(dir_okay=False),
+              help="Onde gravar o relatório das linhas recusadas (padrão: <arquivo>-rejeitados.csv).")
+def importar_alunos(arquivo, rejeitados):
+    """Cadastra os alunos de uma planilha .csv ou .xlsx (ex.: migração de outro sistema)."""
+    from app import importacao
+
+    rejeitados = rejeitados or f"{os.path.splitext(arquivo)[0]}-rejeitados.csv"
+    totais = None
+    try:
+        with open(arquivo, 'rb') as entrada, open(rejeitados, 'w', newline='', encoding='utf-8-sig') as saida:
+            totais = importacao.importar(entrada, arquivo, saida, progresso=lambda lidas, importados, recusados: print(
+                f"{lidas} linha(s) lida(s): {importados} importada(s), {recusados} recusada(s)..."
+            ))
+    except ValueError as erro:
+        raise click.ClickException(str(erro))
+    finally:
+        # O relatório só fica se a importação terminar com linhas recusadas
+        if (totais is None or not totais['recusados']) and os.path.exists(rejeitados):
+            os.remove(rejeitados)
+
+    print(f"Concluído: {totais['importados']} aluno(s) importado(s), {totais['recusados']} linha(s) recusada(s).")
+    if totais['recusados']:
+        print(f"Relatório das linhas recusadas: {rejeitados}")
+
+
+@app.cli.command("arquivar-frequencias")
+@click.option("--dias", type=int, help="Dias de check-ins mantidos na tabela frequencia (padrão: FREQUENCIA_RETENCAO_DIAS).")
+@click.option("--lote", default=5000, show_default=True, help="Check-ins movidos por transação.")
+def arquivar_frequencias(dias, lote):
+    """Move os check-ins antigos para a tabela de arquivo (frequencia_arquivo)."""
+    from app import arquivamento
+
+    if dias is not None:
+        app.config['FREQUENCIA_RETENCAO_DIAS'] = dias
+    corte = arquivamento.corte_padrao()
+    print(f"Arquivando {arquivamento.contar_arquivaveis(corte)} check-in(s) anteriores a {corte:%d/%m/%Y %H:%M} (UTC)...")
+    inicio = datetime.now()
+    total = arquivamento.arquivar(corte, lote=lote, progresso=lambda movidos: print(f"{movidos} check-in(s) arquivado(s)..."))
+    print(f"Concluído: {total} check-in(s) arquivado(s) em {(datetime.now() - inicio).total_seconds():.1f}s.")
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file